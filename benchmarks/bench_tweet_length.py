@@ -0,0 +1,63 @@
+"""Micro-benchmark for the weighted tweet length engine.
+
+Runs weighted_length and truncate_tweet over a million strings drawn from a
+mix of ASCII, accented Latin, CJK, emoji (including ZWJ sequences) and URLs,
+and reports throughput per function.
+
+Usage: python benchmarks/bench_tweet_length.py [--count 1000000]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from posting_agent import truncate_tweet, weighted_length  # noqa: E402
+
+FRAGMENTS = [
+    "Good morning, builders! ",
+    "Shipping small and often beats shipping big and late. ",
+    "Café crème et résumé naïve. ",
+    "今日も一日頑張りましょう。",
+    "인공지능의 미래 ",
+    "🚀 ",
+    "👨‍👩‍👧 ",
+    "👍🏽 ",
+    "🇺🇸 ",
+    "Read more at https://example.com/posts/42 ",
+    "#BuildInPublic #AI ",
+]
+
+def build_samples(count: int, distinct: int = 4096, seed: int = 42):
+    """Return count strings cycling over a pool of distinct random samples"""
+    rng = random.Random(seed)
+    pool = []
+    for _ in range(distinct):
+        parts = rng.choices(FRAGMENTS, k=rng.randint(1, 25))
+        pool.append(''.join(parts))
+    return [pool[i % distinct] for i in range(count)]
+
+def bench(name: str, func, samples):
+    start = time.perf_counter()
+    for text in samples:
+        func(text)
+    elapsed = time.perf_counter() - start
+    per_call = elapsed / len(samples) * 1e9
+    print(f"{name:<16} {len(samples):>9} strings  {elapsed:8.3f}s  {per_call:8.0f} ns/string")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--count', type=int, default=1_000_000, help="number of strings to process")
+    args = parser.parse_args()
+    
+    samples = build_samples(args.count)
+    over_limit = sum(1 for text in samples[:4096] if weighted_length(text) > 280)
+    print(f"{over_limit}/4096 distinct samples exceed the tweet limit")
+    
+    bench('weighted_length', weighted_length, samples)
+    bench('truncate_tweet', truncate_tweet, samples)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+"""In-process stand-ins for the X and Gemini APIs.
+
+FakeXClient mimics tweepy.Client.create_tweet against X v2 POST /2/tweets,
+including x-rate-limit-* headers, 429s once the window is spent, 403s for
+duplicate content and random 5xx errors. FakeGeminiModel mimics
+GenerativeModel.generate_content_async, streamed or not, with configurable
+latency, error rate and a requests-per-minute quota.
+
+Both raise errors carrying a .response with status_code and headers, so the
+agent's retry classification and rate limit scheduler see the same shapes as
+with the real libraries.
+"""
+import asyncio
+import itertools
+import random
+import threading
+import time
+from typing import Any, Dict, Optional
+
+WORDS = (
+    "ship build learn model data agents latency prompt launch teams open "
+    "source small steps daily wins users feedback iterate scale future "
+    "today focus craft tools automate measure improve curious"
+).split()
+
+class FakeResponse:
+    """Minimal requests.Response look-alike"""
+    
+    def __init__(self, status_code: int, payload: Optional[Dict[str, Any]] = None,
+                 headers: Optional[Dict[str, str]] = None):
+        self.status_code = status_code
+        self.headers = headers or {}
+        self._payload = payload or {}
+    
+    def json(self) -> Dict[str, Any]:
+        return self._payload
+
+class FakeAPIError(Exception):
+    """HTTP error raised by the fakes, shaped like tweepy.HTTPException"""
+    
+    def __init__(self, response: FakeResponse, message: str):
+        super().__init__(f"{response.status_code} {message}")
+        self.response = response
+
+def _jittered(latency: float, jitter: float, rng: random.Random) -> float:
+    return max(0.0, latency + rng.uniform(-jitter, jitter))
+
+class FakeXClient:
+    """Stand-in for tweepy.Client posting to X v2 POST /2/tweets
+    
+    create_tweet is blocking, like tweepy's, and is called from worker
+    threads by TwitterPoster, so all shared state is guarded by a lock.
+    """
+    
+    def __init__(self, latency: float = 0.2, jitter: float = 0.05, error_rate: float = 0.0,
+                 rate_limit: int = 200, window: float = 900.0, reject_duplicates: bool = True,
+                 seed: Optional[int] = None):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate_limit = rate_limit
+        self.window = window
+        self.reject_duplicates = reject_duplicates
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.remaining = rate_limit
+        self.reset = time.time() + window
+        self.ids = itertools.count(1)
+        self.posted = set()
+        self.calls = 0
+        self.rejected = {429: 0, 403: 0, 503: 0}
+    
+    def _headers(self) -> Dict[str, str]:
+        return {
+            'x-rate-limit-limit': str(self.rate_limit),
+            'x-rate-limit-remaining': str(self.remaining),
+            'x-rate-limit-reset': str(int(self.reset))
+        }
+    
+    def _reject(self, status: int, message: str):
+        self.rejected[status] += 1
+        raise FakeAPIError(FakeResponse(status, headers=self._headers()), message)
+    
+    def create_tweet(self, text: Optional[str] = None, in_reply_to_tweet_id: Optional[str] = None,
+                     media_ids=None, **kwargs) -> FakeResponse:
+        with self.lock:
+            delay = _jittered(self.latency, self.jitter, self.rng)
+            failed = self.rng.random() < self.error_rate
+        time.sleep(delay)
+        with self.lock:
+            self.calls += 1
+            now = time.time()
+            if now >= self.reset:
+                self.remaining = self.rate_limit
+                self.reset = now + self.window
+            if self.remaining <= 0:
+                self._reject(429, "Too Many Requests")
+            self.remaining -= 1
+            if failed:
+                self._reject(503, "Service Unavailable")
+            if self.reject_duplicates and text in self.posted:
+                self._reject(403, "You are not allowed to create a Tweet with duplicate content.")
+            self.posted.add(text)
+            data = {'id': str(next(self.ids)), 'text': text}
+            return FakeResponse(201, {'data': data}, self._headers())
+
+class FakeChunk:
+    def __init__(self, text: str):
+        self.text = text
+
+class FakeUsage:
+    """usage_metadata with roughly four characters per token"""
+    
+    def __init__(self, prompt: str, text: str):
+        self.prompt_token_count = len(prompt) // 4
+        self.candidates_token_count = len(text) // 4
+
+class FakeResult:
+    def __init__(self, text: str, usage: FakeUsage):
+        self.text = text
+        self.usage_metadata = usage
+
+class FakeStream:
+    """Async-iterable response of generate_content_async(stream=True)"""
+    
+    def __init__(self, chunks, chunk_delay: float, usage: FakeUsage):
+        self._iterator = self._generate(chunks, chunk_delay)
+        self.usage_metadata = usage
+    
+    @staticmethod
+    async def _generate(chunks, chunk_delay: float):
+        for chunk in chunks:
+            await asyncio.sleep(chunk_delay)
+            yield FakeChunk(chunk)
+    
+    def __aiter__(self):
+        return self._iterator
+
+class FakeGeminiModel:
+    """Stand-in for google.generativeai.GenerativeModel
+    
+    latency is the time to the full response; when streamed it is split
+    into time to first chunk plus an even delay per remaining chunk.
+    """
+    
+    def __init__(self, model_name: str = 'fake-gemini', latency: float = 1.0, jitter: float = 0.3,
+                 error_rate: float = 0.0, requests_per_minute: int = 0, chunks: int = 4,
+                 text_length: int = 220, seed: Optional[int] = None):
+        self.model_name = model_name
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.requests_per_minute = requests_per_minute
+        self.chunks = max(1, chunks)
+        self.text_length = text_length
+        self.rng = random.Random(seed)
+        self.window_start = time.monotonic()
+        self.window_calls = 0
+        self.calls = 0
+        self.rejected = {429: 0, 503: 0}
+    
+    def _check_quota(self):
+        now = time.monotonic()
+        if now - self.window_start >= 60:
+            self.window_start = now
+            self.window_calls = 0
+        self.window_calls += 1
+        if self.requests_per_minute and self.window_calls > self.requests_per_minute:
+            self.rejected[429] += 1
+            raise FakeAPIError(FakeResponse(429), "Resource has been exhausted (e.g. check quota).")
+    
+    def _text(self) -> str:
+        words = []
+        while sum(len(word) + 1 for word in words) < self.text_length:
+            words.append(self.rng.choice(WORDS))
+        return ' '.join(words).capitalize() + '.'
+    
+    async def generate_content_async(self, prompt: str, stream: bool = False):
+        self.calls += 1
+        self._check_quota()
+        latency = _jittered(self.latency, self.jitter, self.rng)
+        if self.rng.random() < self.error_rate:
+            await asyncio.sleep(latency)
+            self.rejected[503] += 1
+            raise FakeAPIError(FakeResponse(503), "The service is currently unavailable.")
+        text = self._text()
+        usage = FakeUsage(prompt, text)
+        if not stream:
+            await asyncio.sleep(latency)
+            return FakeResult(text, usage)
+        step = -(-len(text) // self.chunks)
+        chunks = [text[i:i + step] for i in range(0, len(text), step)]
+        await asyncio.sleep(latency / 2)
+        return FakeStream(chunks, latency / 2 / len(chunks), usage)
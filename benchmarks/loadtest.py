@@ -0,0 +1,152 @@
+"""Load test for GitHubActionsPostingAgent.create_and_post.
+
+Drives the real agent (generation, caching, retries, rate limit scheduling,
+multi-account fan-out) against the in-process fakes in benchmarks/fakes.py,
+so nothing touches the real X or Gemini APIs or burns quota. Runs
+create_and_post --runs times with at most --concurrency runs in flight and
+reports throughput and p50/p95/p99 run latency.
+
+Usage: python benchmarks/loadtest.py [--runs 200] [--concurrency 20]
+       [--x-error-rate 0.05] [--x-rate-limit 100 --x-window 30] ...
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fakes import FakeGeminiModel, FakeXClient  # noqa: E402
+from posting_agent import (  # noqa: E402
+    GitHubActionsPostingAgent,
+    LatencyTracker,
+    RateLimitScheduler,
+    RetryBudget,
+    TwitterPoster,
+    create_content_generator,
+)
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=200, help="create_and_post calls in total")
+    parser.add_argument('--concurrency', type=int, default=20, help="create_and_post calls in flight")
+    parser.add_argument('--accounts', type=int, default=1, help="X accounts each run posts to")
+    parser.add_argument('--candidates', type=int, default=1, help="CANDIDATE_COUNT for each run")
+    parser.add_argument('--no-stream', action='store_true', help="disable streamed generation")
+    parser.add_argument('--x-latency', type=float, default=0.2, help="seconds per POST /2/tweets")
+    parser.add_argument('--x-error-rate', type=float, default=0.0, help="fraction of posts failing with 503")
+    parser.add_argument('--x-rate-limit', type=int, default=200, help="posts per account per window")
+    parser.add_argument('--x-window', type=float, default=900.0,
+                        help="rate limit window in seconds (the agent assumes X's 900s)")
+    parser.add_argument('--gemini-latency', type=float, default=1.0, help="seconds per generation")
+    parser.add_argument('--gemini-error-rate', type=float, default=0.0,
+                        help="fraction of generations failing with 503")
+    parser.add_argument('--gemini-rpm', type=int, default=0, help="Gemini requests per minute, 0 for unlimited")
+    parser.add_argument('--max-wait', type=float, default=60.0, help="RATE_LIMIT_MAX_WAIT for the agent")
+    parser.add_argument('--seed', type=int, default=None, help="seed for the fakes")
+    parser.add_argument('--verbose', action='store_true', help="show the agent's log output")
+    return parser.parse_args()
+
+def build_agent(args, state_dir: str):
+    """Wire a real agent to fake clients"""
+    config = {
+        "topic": "Artificial Intelligence",
+        "posting_time": "09:00",
+        "candidate_count": args.candidates,
+        "generation_concurrency": 4,
+        "stream_generation": not args.no_stream,
+        "cache_ttl": 0,
+        "rate_limit_max_wait": args.max_wait,
+        "thread_max_parts": 1,
+        "history_path": os.path.join(state_dir, "post_history.jsonl"),
+        "gemini_api_key": "fake",
+    }
+    gemini = {}
+    
+    def model_factory(name: str) -> FakeGeminiModel:
+        gemini[name] = FakeGeminiModel(
+            name,
+            latency=args.gemini_latency,
+            jitter=args.gemini_latency * 0.3,
+            error_rate=args.gemini_error_rate,
+            requests_per_minute=args.gemini_rpm,
+            seed=args.seed
+        )
+        return gemini[name]
+    
+    clients = {}
+    posters = {}
+    for index in range(args.accounts):
+        name = 'default' if args.accounts == 1 else f"account{index + 1}"
+        clients[name] = FakeXClient(
+            latency=args.x_latency,
+            jitter=args.x_latency * 0.25,
+            error_rate=args.x_error_rate,
+            rate_limit=args.x_rate_limit,
+            window=args.x_window,
+            seed=args.seed
+        )
+        posters[name] = TwitterPoster(
+            {},
+            RateLimitScheduler(max_wait=args.max_wait),
+            # One agent serves every run here, so size the run-wide retry
+            # budget as if each run had its own
+            RetryBudget(5 * args.runs),
+            name=name,
+            client=clients[name]
+        )
+    generator = create_content_generator(config, model_factory=model_factory)
+    agent = GitHubActionsPostingAgent(config, content_generator=generator, twitter_posters=posters)
+    return agent, gemini, clients
+
+async def run(args, agent):
+    semaphore = asyncio.Semaphore(max(1, args.concurrency))
+    latencies = LatencyTracker(window=max(1, args.runs))
+    results = []
+    
+    async def one_run():
+        async with semaphore:
+            start = time.perf_counter()
+            results.append(await agent.create_and_post())
+            latencies.record(time.perf_counter() - start)
+    
+    start = time.perf_counter()
+    await asyncio.gather(*(one_run() for _ in range(args.runs)))
+    return time.perf_counter() - start, results, latencies
+
+def main():
+    args = parse_args()
+    logging.getLogger('posting_agent').setLevel(logging.INFO if args.verbose else logging.CRITICAL)
+    
+    with tempfile.TemporaryDirectory() as state_dir:
+        agent, gemini, clients = build_agent(args, state_dir)
+        loop = asyncio.new_event_loop()
+        # TwitterPoster posts from worker threads; keep the default pool
+        # from becoming the bottleneck at high concurrency
+        loop.set_default_executor(ThreadPoolExecutor(max(32, args.concurrency * args.accounts)))
+        try:
+            elapsed, results, latencies = loop.run_until_complete(run(args, agent))
+        finally:
+            loop.close()
+    
+    succeeded = sum(results)
+    posts = sum(len(client.posted) for client in clients.values())
+    print(f"runs         {len(results)} ({succeeded} succeeded, {len(results) - succeeded} failed) "
+          f"at concurrency {args.concurrency}, {args.accounts} account(s)")
+    print(f"wall time    {elapsed:.2f}s")
+    print(f"throughput   {len(results) / elapsed:.2f} runs/s, {posts / elapsed:.2f} posts/s")
+    print("latency      " + "  ".join(
+        f"p{int(fraction * 100)} {latencies.percentile(fraction):.3f}s" for fraction in (0.5, 0.95, 0.99)
+    ) + f"  max {max(latencies.samples):.3f}s")
+    for name, client in clients.items():
+        print(f"x[{name}] {client.calls} requests, {len(client.posted)} posted, "
+              f"rejected {client.rejected}")
+    for name, model in gemini.items():
+        print(f"gemini[{name}] {model.calls} requests, rejected {model.rejected}")
+
+if __name__ == "__main__":
+    main()
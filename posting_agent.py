@@ -2,12 +2,36 @@ import os
 import asyncio
 import logging
 from datetime import datetime, timedelta
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List, Tuple, Callable
+import argparse
 import json
-import google.generativeai as genai
-import tweepy
-from dotenv import load_dotenv
+import math
+import mimetypes
+import random
+import re
+import sqlite3
+import struct
+import time
+import unicodedata
+import zlib
+import hashlib
+import heapq
+import io
+import signal
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from functools import lru_cache
 import sys
+import threading
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: history writes are only serialized within one process
+    fcntl = None
+
+# google.generativeai, tweepy and dotenv are imported where they are first
+# used; they dominate startup and are not needed when config validation fails.
 
 # Configure logging
 logging.basicConfig(
@@ -16,30 +40,1553 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-class ContentGenerator:
-    """Handles content generation using Gemini API"""
+# X/Twitter character limit for a single post
+MAX_TWEET_LENGTH = 280
+
+# Weighted length rules from twitter-text v3: code points inside these
+# (inclusive) ranges weigh 1, every other code point weighs 2. URLs always
+# count as URL_WEIGHT and a whole emoji sequence counts as EMOJI_WEIGHT.
+LIGHT_CODE_POINT_RANGES = (
+    (0x0000, 0x10FF),
+    (0x2000, 0x200D),
+    (0x2010, 0x201F),
+    (0x2032, 0x2037),
+)
+URL_WEIGHT = 23
+EMOJI_WEIGHT = 2
+
+def _range_class(ranges) -> str:
+    """Render (start, end) code point ranges as a regex character class body"""
+    return ''.join(f"\\U{start:08x}-\\U{end:08x}" for start, end in ranges)
+
+def _complement_ranges(ranges):
+    """Return the code point ranges not covered by sorted ranges"""
+    complement = []
+    next_start = 0
+    for start, end in ranges:
+        if start > next_start:
+            complement.append((next_start, start - 1))
+        next_start = end + 1
+    if next_start <= sys.maxunicode:
+        complement.append((next_start, sys.maxunicode))
+    return complement
+
+_HEAVY_CLASS = _range_class(_complement_ranges(LIGHT_CODE_POINT_RANGES))
+_HEAVY_CHAR_PATTERN = re.compile(f"[{_HEAVY_CLASS}]")
+_URL_END = r"[A-Za-z0-9/#=&%+~_-]"
+_URL_PATTERN = re.compile(
+    rf"(?i:https?://|www\.)[!-~]*{_URL_END}"
+    r"|\b[A-Za-z0-9-]+(?:\.[A-Za-z0-9-]+)*\.(?i:com|org|net|io|ai|dev|co|app|me|info|xyz)\b"
+    rf"(?:/(?:[!-~]*{_URL_END})?)?"
+)
+
+_EMOJI_ELEMENT = (
+    "(?:[\u231a-\u23ff\u2460-\u27bf\u2934\u2935\u2b05-\u2bff\u3030\u303d\u3297\u3299"
+    "\U0001f000-\U0001faff][\ufe0e\ufe0f]?"
+    "|[\u00a9\u00ae\u203c\u2049\u2122\u2139\u2194-\u21aa]\ufe0f)"
+    "[\U0001f3fb-\U0001f3ff]?"
+)
+# The leading lookahead lets the regex engine reject most positions with a
+# single character class test before trying the alternation
+_EMOJI_REGEX = (
+    "(?=[\u231a-\u23ff\u2460-\u27bf\u2934\u2935\u2b05-\u2bff\u3030\u303d\u3297\u3299"
+    "\U0001f000-\U0001faff\u00a9\u00ae\u203c\u2049\u2122\u2139\u2194-\u21aa#*0-9])"
+    "(?:[\U0001f1e6-\U0001f1ff]{2}"
+    "|[#*0-9]\ufe0f?\u20e3"
+    f"|{_EMOJI_ELEMENT}(?:\u200d{_EMOJI_ELEMENT})*[\U000e0020-\U000e007f]*)"
+)
+_EMOJI_PATTERN = re.compile(_EMOJI_REGEX)
+
+def _plain_weight(text: str) -> int:
+    """Weighted length of text that contains no URLs or emoji"""
+    if text.isascii():
+        return len(text)
+    return len(text) + len(_HEAVY_CHAR_PATTERN.findall(text))
+
+def weighted_length(text: str) -> int:
+    """Length of text as counted by X: weighted code points, URLs and emoji
+    
+    Runs in O(n) with a constant number of C-level regex passes: ASCII text
+    needs none unless it contains a dot, heavy code points are counted in one
+    pass, emoji sequences (which always contain a heavy code point) are only
+    searched for when there is one, and URLs are only searched for in the
+    words that contain a dot.
+    """
+    if text.isascii():
+        length = len(text)
+    else:
+        text = unicodedata.normalize('NFC', text)
+        heavy = len(_HEAVY_CHAR_PATTERN.findall(text))
+        length = len(text) + heavy
+        if heavy:
+            emoji = _EMOJI_PATTERN.findall(text)
+            if emoji:
+                length += EMOJI_WEIGHT * len(emoji) - _plain_weight(''.join(emoji))
     
-    def __init__(self, api_key: str):
-        genai.configure(api_key=api_key)
-        self.model = genai.GenerativeModel('gemini-1.5-flash')
+    if '.' in text:
+        dotted = ' '.join(word for word in text.split() if '.' in word)
+        urls = _URL_PATTERN.findall(dotted)
+        if urls:
+            length += URL_WEIGHT * len(urls) - _plain_weight(''.join(urls))
+    return length
+
+@lru_cache(maxsize=1)
+def _unit_pattern():
+    """Pattern splitting text into emoji sequences and grapheme clusters
     
-    async def generate_content(self, topic: str, time_context: str = "", additional_context: str = "") -> str:
-        """Generate content for the specified topic"""
+    A grapheme cluster here is a code point plus any combining marks,
+    variation selectors and joiners that follow it. The combining mark table
+    is derived from unicodedata on first use so it costs nothing at import.
+    """
+    marks = []
+    start = None
+    for code_point in range(0x10000):
+        is_mark = unicodedata.category(chr(code_point)) in ('Mn', 'Mc', 'Me') or code_point == 0x200D
+        if is_mark and start is None:
+            start = code_point
+        elif not is_mark and start is not None:
+            marks.append((start, code_point - 1))
+            start = None
+    marks.append((0xE0100, 0xE01EF))
+    return re.compile(f"{_EMOJI_REGEX}|\r\n|.[{_range_class(marks)}]*", re.DOTALL)
+
+def truncate_tweet(text: str, limit: int = MAX_TWEET_LENGTH, ellipsis: str = "...") -> str:
+    """Shorten text to at most limit weighted characters, ellipsis included
+    
+    The cut never splits a URL, an emoji sequence or a grapheme cluster, and
+    falls back to the last word boundary unless that would drop more than
+    half of the text that fits.
+    """
+    text = unicodedata.normalize('NFC', text)
+    if weighted_length(text) <= limit:
+        return text
+    
+    budget = limit - weighted_length(ellipsis)
+    url_spans = {}
+    if '.' in text:
+        url_spans = {match.start(): match.end() for match in _URL_PATTERN.finditer(text)}
+    
+    if text.isascii() and not url_spans:
+        # Every character weighs 1, so the cut position is the budget itself
+        used = cut = budget
+        word_cut = max(text.rfind(space, 0, budget + 1) for space in ' \t\n')
+        word_used = max(word_cut, 0)
+    else:
+        used = 0
+        cut = 0
+        word_used = 0
+        word_cut = 0
+        position = 0
+        skip_until = 0
+        for unit in _unit_pattern().findall(text):
+            start = position
+            position += len(unit)
+            if start < skip_until:
+                continue
+            end = position
+            if start in url_spans:
+                weight = URL_WEIGHT
+                end = skip_until = url_spans[start]
+            elif unit.isascii():
+                weight = len(unit)
+            elif _EMOJI_PATTERN.fullmatch(unit):
+                weight = EMOJI_WEIGHT
+            else:
+                weight = _plain_weight(unit)
+            if unit.isspace():
+                word_used, word_cut = used, start
+            if used + weight > budget:
+                break
+            used += weight
+            cut = end
+    
+    if word_used < used // 2:
+        word_cut = cut
+    return text[:word_cut].rstrip() + ellipsis
+
+def split_into_thread(text: str, max_parts: int, limit: int = MAX_TWEET_LENGTH) -> List[str]:
+    """Split text at word boundaries into at most max_parts tweet-sized parts
+    
+    Room is left in every part for a " n/total" counter. Text that does not
+    fit in max_parts is truncated with an ellipsis in the last part.
+    """
+    text = unicodedata.normalize('NFC', text).strip()
+    reserve = weighted_length(f" {max_parts}/{max_parts}")
+    parts = []
+    while text and len(parts) < max_parts:
+        if len(parts) == max_parts - 1:
+            parts.append(truncate_tweet(text, limit - reserve))
+            break
+        part = truncate_tweet(text, limit - reserve, ellipsis="")
+        if not part:
+            # A single unit that does not fit; fall back to a hard cut
+            part = truncate_tweet(text, limit - reserve)
+            parts.append(part)
+            break
+        parts.append(part)
+        text = text[len(part):].lstrip()
+    return parts
+
+def time_context_for(posting_time: str) -> str:
+    """'morning' or 'evening' for an HH:MM posting time"""
+    return "morning" if int(posting_time.split(':')[0]) < 12 else "evening"
+
+def posting_slots(posting_times: List[str], days: int,
+                  now: Optional[datetime] = None) -> List[Tuple[datetime, str]]:
+    """Upcoming (slot time, time context) pairs for the next days days"""
+    now = now or datetime.now()
+    slots = []
+    for day in range(days):
+        date = (now + timedelta(days=day)).date()
+        for posting_time in posting_times:
+            hour, minute = (int(part) for part in posting_time.split(':'))
+            slot = datetime(date.year, date.month, date.day, hour, minute)
+            if slot > now:
+                slots.append((slot, time_context_for(posting_time)))
+    return sorted(slots)
+
+class RunTimer:
+    """Accumulates wall time per phase of a run for the startup-time report"""
+    
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases: Dict[str, float] = {}
+    
+    @contextmanager
+    def phase(self, name: str):
+        """Time the enclosed block and add it to the named phase"""
+        start = time.perf_counter()
         try:
-            # Determine time-based context
-            current_hour = datetime.now().hour
-            if current_hour < 12:
-                time_hashtag = "#MorningMotivation"
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0.0) + time.perf_counter() - start
+    
+    def report(self):
+        """Log the per-phase breakdown and the total run time"""
+        total = time.perf_counter() - self.started
+        breakdown = ', '.join(f"{name}={seconds:.3f}s" for name, seconds in self.phases.items())
+        logger.info(f"Run timing: {breakdown or 'no phases recorded'} (total {total:.3f}s)")
+
+run_timer = RunTimer()
+
+class ResponseCache:
+    """On-disk cache of Gemini responses with size-bounded LRU and TTL eviction
+    
+    Each entry lives in its own JSON file named after the cache key, so a write
+    touches one small file regardless of cache size. Recency is tracked in
+    memory and mirrored to the file mtime so LRU order survives restarts.
+    """
+    
+    def __init__(self, cache_dir: str = '.gemini_cache', max_entries: int = 256, ttl: float = 43200):
+        self.cache_dir = cache_dir
+        self.max_entries = max(1, max_entries)
+        self.ttl = ttl
+        # key -> (created, text), ordered from least to most recently used
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._load()
+    
+    @staticmethod
+    def make_key(model_name: str, prompt: str, variant: int = 0) -> str:
+        """Hash model name, rendered prompt and candidate variant into a key"""
+        digest = hashlib.sha256()
+        for part in (model_name, prompt, str(variant)):
+            digest.update(part.encode('utf-8'))
+            digest.update(b'\0')
+        return digest.hexdigest()
+    
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.json")
+    
+    def _load(self):
+        """Index existing entries, oldest access first"""
+        if not os.path.isdir(self.cache_dir):
+            return
+        loaded = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith('.json'):
+                continue
+            key = name[:-len('.json')]
+            path = self._path(key)
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    entry = json.load(f)
+                loaded.append((os.path.getmtime(path), key, entry['created'], entry['text']))
+            except (OSError, ValueError, KeyError) as e:
+                logger.warning(f"Dropping unreadable cache entry {name}: {e}")
+                self._remove_file(key)
+        now = time.time()
+        for _, key, created, text in sorted(loaded):
+            if now - created > self.ttl:
+                self._remove_file(key)
             else:
-                time_hashtag = "#EveningThoughts"
-            
-            prompt = f"""
+                self._entries[key] = (created, text)
+        self._evict()
+        logger.info(f"Loaded {len(self._entries)} cached Gemini responses")
+    
+    def _remove_file(self, key: str):
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+    
+    def invalidate(self, key: str):
+        """Drop the entry for key, if any"""
+        self._entries.pop(key, None)
+        self._remove_file(key)
+    
+    def invalidate_matching(self, match: Callable[[str], bool]) -> int:
+        """Drop every entry whose text satisfies match; returns the number dropped"""
+        keys = [key for key, (_, text) in self._entries.items() if match(text)]
+        for key in keys:
+            self.invalidate(key)
+        return len(keys)
+    
+    def _evict(self):
+        while len(self._entries) > self.max_entries:
+            key, _ = self._entries.popitem(last=False)
+            self._remove_file(key)
+    
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached text for key, or None on a miss or expired entry"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        created, text = entry
+        if time.time() - created > self.ttl:
+            self.invalidate(key)
+            return None
+        self._entries.move_to_end(key)
+        try:
+            os.utime(self._path(key))
+        except OSError:
+            pass
+        return text
+    
+    def put(self, key: str, text: str):
+        """Store text under key, evicting the least recently used entries"""
+        created = time.time()
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp_path = self._path(key) + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'created': created, 'text': text}, f)
+            os.replace(tmp_path, self._path(key))
+        except OSError as e:
+            logger.warning(f"Could not write cache entry: {e}")
+            return
+        self._entries[key] = (created, text)
+        self._entries.move_to_end(key)
+        self._evict()
+
+class FallbackPool:
+    """Pre-generated, validated tweets posted when live generation fails
+    
+    The pool is filled ahead of time in a batch run (--mode fill-fallback-pool)
+    and stored as JSON, one list per time context. Taking a post is a pop from
+    the end of a list, so the failure path needs no API call.
+    """
+    
+    TIME_CONTEXTS = ('morning', 'evening')
+    
+    def __init__(self, path: str):
+        self.path = path
+        self.posts: Dict[str, List[str]] = {context: [] for context in self.TIME_CONTEXTS}
+        self._load()
+    
+    def _load(self):
+        try:
+            if os.path.exists(self.path):
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                for context in self.TIME_CONTEXTS:
+                    self.posts[context] = list(data.get(context, []))
+                logger.info(f"Loaded fallback pool with {len(self)} posts")
+        except Exception as e:
+            logger.error(f"Error loading fallback pool: {e}")
+    
+    def _save(self):
+        try:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.posts, f, indent=2)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            logger.error(f"Error saving fallback pool: {e}")
+    
+    def __len__(self) -> int:
+        return sum(len(posts) for posts in self.posts.values())
+    
+    def take(self, time_context: str = "") -> Optional[str]:
+        """Remove and return a post for time_context, or None if none are left"""
+        contexts = [time_context] if time_context in self.posts else list(self.TIME_CONTEXTS)
+        for context in contexts:
+            if self.posts[context]:
+                content = self.posts[context].pop()
+                self._save()
+                logger.info(f"Using fallback pool post ({len(self.posts[context])} {context} posts left)")
+                return content
+        return None
+    
+    def add(self, time_context: str, posts: List[str]) -> int:
+        """Add posts that fit in a tweet and are not already pooled"""
+        pooled = set(self.posts[time_context])
+        added = 0
+        for content in posts:
+            if not content or content in pooled or weighted_length(content) > MAX_TWEET_LENGTH:
+                continue
+            self.posts[time_context].append(content)
+            pooled.add(content)
+            added += 1
+        if added:
+            self._save()
+        return added
+    
+    async def fill(self, generator: 'ContentGenerator', topic: str, target: int, max_rounds: int = 3) -> int:
+        """Top up every time context to target posts in concurrent batches"""
+        added = 0
+        for context in self.TIME_CONTEXTS:
+            for _ in range(max_rounds):
+                missing = target - len(self.posts[context])
+                if missing <= 0:
+                    break
+                candidates = await generator.generate_candidates(topic, missing, context, use_cache=False)
+                # Only keep posts the model finished within the limit
+                added += self.add(context, [
+                    candidate['content'] for candidate in candidates
+                    if candidate['raw_length'] <= MAX_TWEET_LENGTH
+                ])
+        logger.info(f"Fallback pool now holds {len(self)} posts ({added} added)")
+        return added
+
+class PostRecord:
+    """One tweet: what was posted, when, where, and how it was generated
+    
+    Token counts and latencies are None when unknown, e.g. for fallback
+    content. __slots__ keeps a record at less than half the size of the
+    equivalent dict, so millions of them fit in memory for analytics.
+    """
+    
+    __slots__ = ('timestamp', 'account', 'topic', 'tweet_id', 'content', 'model',
+                 'prompt_tokens', 'completion_tokens', 'generation_latency', 'post_latency')
+    # Known once content is generated, before it is posted
+    GENERATION_FIELDS = ('model', 'prompt_tokens', 'completion_tokens', 'generation_latency')
+    
+    def __init__(self, content: str, timestamp: Optional[str] = None, account: Optional[str] = None,
+                 topic: Optional[str] = None, tweet_id: Optional[str] = None, model: Optional[str] = None,
+                 prompt_tokens: Optional[int] = None, completion_tokens: Optional[int] = None,
+                 generation_latency: Optional[float] = None, post_latency: Optional[float] = None):
+        self.content = content
+        self.timestamp = timestamp
+        self.account = account
+        self.topic = topic
+        self.tweet_id = tweet_id
+        self.model = model
+        self.prompt_tokens = prompt_tokens
+        self.completion_tokens = completion_tokens
+        self.generation_latency = generation_latency
+        self.post_latency = post_latency
+    
+    def __repr__(self) -> str:
+        return f"PostRecord({self.timestamp!r}, {self.account!r}, {self.tweet_id!r}, {self.content[:30]!r})"
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Fields that are set, as stored in the JSONL history"""
+        return {field: getattr(self, field) for field in self.__slots__ if getattr(self, field) is not None}
+    
+    def generation(self) -> Dict[str, Any]:
+        """The generation fields that are set"""
+        return {field: getattr(self, field) for field in self.GENERATION_FIELDS if getattr(self, field) is not None}
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'PostRecord':
+        """Build a record from to_dict() output; unknown keys are ignored"""
+        return cls(**{field: data[field] for field in cls.__slots__ if field in data})
+    
+    @classmethod
+    def from_candidate(cls, candidate: Dict[str, Any], topic: Optional[str] = None) -> 'PostRecord':
+        """Build a record from a ContentGenerator.generate_candidates() result"""
+        return cls(
+            candidate['content'],
+            topic=topic,
+            model=candidate.get('model'),
+            prompt_tokens=candidate.get('prompt_tokens'),
+            completion_tokens=candidate.get('completion_tokens'),
+            generation_latency=candidate.get('latency')
+        )
+
+class Outbox:
+    """Durable queue of generated tweets that have not been posted yet
+    
+    Content is written to SQLite before it is posted and deleted once X
+    accepts it, so a failed post (or a crash mid-run) keeps the tweet for the
+    next run instead of paying for a fresh generation. Entries are dropped
+    after a permanent error or max_attempts failed posts.
+    """
+    
+    def __init__(self, path: str, max_attempts: int = 3):
+        self.path = path
+        self.max_attempts = max(1, max_attempts)
+        # Entries being posted by this process, so concurrent posts for the
+        # same account never pick the same entry
+        self.claimed = set()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        self.conn.row_factory = sqlite3.Row
+        with self.conn:
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS outbox ("
+                " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+                " account TEXT NOT NULL,"
+                " content TEXT NOT NULL,"
+                " topic TEXT,"
+                " time_context TEXT,"
+                " created_at REAL NOT NULL,"
+                " not_before REAL NOT NULL DEFAULT 0,"
+                " attempts INTEGER NOT NULL DEFAULT 0,"
+                " last_error TEXT,"
+                " generation TEXT,"
+                " slot REAL)"
+            )
+            columns = {row['name'] for row in self.conn.execute("PRAGMA table_info(outbox)")}
+            for column, kind in (('generation', 'TEXT'), ('slot', 'REAL')):
+                if column not in columns:
+                    # Outboxes created before the column was introduced
+                    self.conn.execute(f"ALTER TABLE outbox ADD COLUMN {column} {kind}")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS outbox_due ON outbox (account, not_before, id)")
+    
+    def close(self):
+        self.conn.close()
+    
+    def add(self, account: str, content: str, topic: Optional[str] = None,
+            time_context: Optional[str] = None, not_before: float = 0.0, claim: bool = False,
+            generation: Optional[Dict[str, Any]] = None, slot: Optional[float] = None) -> int:
+        """Queue content for account, to be posted no earlier than not_before
+        
+        generation holds PostRecord.generation() of the content, so the
+        model, tokens and latency end up in the history once it is posted.
+        slot is the timestamp of the posting slot the content was generated
+        for, if any.
+        """
+        with self.conn:
+            cursor = self.conn.execute(
+                "INSERT INTO outbox (account, content, topic, time_context, created_at, not_before, generation, slot)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (account, content, topic, time_context, time.time(), not_before,
+                 json.dumps(generation) if generation else None, slot)
+            )
+        if claim:
+            self.claimed.add(cursor.lastrowid)
+        return cursor.lastrowid
+    
+    def claim_next(self, account: str, time_context: Optional[str] = None,
+                   now: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """Claim the oldest unclaimed due entry for account, if any
+        
+        With time_context, entries generated for another time of day are
+        left for a run that matches them.
+        """
+        rows = self.conn.execute(
+            "SELECT * FROM outbox WHERE account = ? AND not_before <= ?"
+            " AND (? IS NULL OR time_context IS NULL OR time_context = ?)"
+            " ORDER BY not_before, slot, id LIMIT ?",
+            (account, time.time() if now is None else now, time_context, time_context, len(self.claimed) + 1)
+        )
+        for row in rows:
+            if row['id'] not in self.claimed:
+                self.claimed.add(row['id'])
+                entry = dict(row)
+                entry['generation'] = json.loads(entry['generation'] or '{}')
+                return entry
+        return None
+    
+    def release(self, entry_id: int):
+        """Let other posts pick up an entry again"""
+        self.claimed.discard(entry_id)
+    
+    def remove(self, entry_id: int):
+        """Forget an entry once it has been posted"""
+        self.claimed.discard(entry_id)
+        with self.conn:
+            self.conn.execute("DELETE FROM outbox WHERE id = ?", (entry_id,))
+    
+    def record_failure(self, entry_id: int, error_kind: Optional[str]) -> bool:
+        """Count a failed post and release the entry; returns False if it was dropped
+        
+        Rate-limited attempts are not counted: the limit says nothing about
+        the content, and often no request was sent at all.
+        """
+        self.claimed.discard(entry_id)
+        with self.conn:
+            self.conn.execute(
+                "UPDATE outbox SET attempts = attempts + ?, last_error = ? WHERE id = ?",
+                (0 if error_kind == 'rate_limited' else 1, error_kind, entry_id)
+            )
+            row = self.conn.execute("SELECT attempts FROM outbox WHERE id = ?", (entry_id,)).fetchone()
+            if row is None:
+                return False
+            if error_kind == 'permanent' or row['attempts'] >= self.max_attempts:
+                self.conn.execute("DELETE FROM outbox WHERE id = ?", (entry_id,))
+                logger.warning(f"Dropping outbox entry {entry_id} after {row['attempts']} attempt(s) "
+                               f"({error_kind or 'unknown'} error)")
+                return False
+        return True
+    
+    def due_count(self, account: str, time_context: Optional[str] = None, now: Optional[float] = None) -> int:
+        """Number of unclaimed entries claim_next could return for account"""
+        rows = self.conn.execute(
+            "SELECT id FROM outbox WHERE account = ? AND not_before <= ?"
+            " AND (? IS NULL OR time_context IS NULL OR time_context = ?)",
+            (account, time.time() if now is None else now, time_context, time_context)
+        )
+        return sum(1 for row in rows if row['id'] not in self.claimed)
+    
+    def queued_slots(self, account: str) -> set:
+        """Timestamps of the posting slots already queued for account"""
+        rows = self.conn.execute(
+            "SELECT slot FROM outbox WHERE account = ? AND slot IS NOT NULL", (account,)
+        )
+        return {row['slot'] for row in rows}
+    
+    async def fill(self, generator: 'ContentGenerator', accounts: List[Dict[str, Any]],
+                   slots: List[Tuple[datetime, str]], topic: str, max_rounds: int = 3) -> int:
+        """Queue one generated post per account and slot that is not queued yet
+        
+        Posts for the same account and time context are generated as one
+        concurrent batch of distinct candidates. An entry becomes due at the
+        start of its slot's day and is taken by the first run with the same
+        time context, so runs that fire a little early or late still match;
+        earlier slots of a day are taken first.
+        """
+        added = 0
+        for account in accounts:
+            name = account['name']
+            queued = self.queued_slots(name)
+            for time_context in sorted({context for _, context in slots}):
+                missing = [
+                    slot for slot, context in slots
+                    if context == time_context and slot.timestamp() not in queued
+                ]
+                posts: List[PostRecord] = []
+                for _ in range(max_rounds):
+                    if len(posts) >= len(missing):
+                        break
+                    candidates = await generator.generate_candidates(
+                        account.get('topic') or topic,
+                        len(missing) - len(posts),
+                        time_context,
+                        use_cache=False
+                    )
+                    for candidate in candidates:
+                        # Only keep distinct posts the model finished within the limit
+                        if (candidate['raw_length'] <= MAX_TWEET_LENGTH
+                                and all(post.content != candidate['content'] for post in posts)):
+                            posts.append(PostRecord.from_candidate(candidate))
+                for slot, post in zip(missing, posts):
+                    due = datetime.combine(slot.date(), datetime.min.time()).timestamp()
+                    self.add(name, post.content, account.get('topic') or topic, time_context, not_before=due,
+                             generation=post.generation(), slot=slot.timestamp())
+                    added += 1
+                if len(posts) < len(missing):
+                    logger.warning(f"Only generated {len(posts)}/{len(missing)} {time_context} posts for {name}")
+        logger.info(f"Outbox now holds {self.pending()} posts ({added} added)")
+        return added
+    
+    def pending(self, account: Optional[str] = None) -> int:
+        """Number of queued entries, for one account or all of them"""
+        if account is None:
+            return self.conn.execute("SELECT COUNT(*) FROM outbox").fetchone()[0]
+        return self.conn.execute("SELECT COUNT(*) FROM outbox WHERE account = ?", (account,)).fetchone()[0]
+
+class PostHistoryLog:
+    """Append-only JSONL log of posted tweets, one record per line
+    
+    Saving a post appends a single line, so its cost does not grow with the
+    history. Once the file has doubled since it was last compacted, it is
+    rewritten in a background thread that drops corrupt lines and duplicate
+    records and applies the optional retention limit.
+    
+    Appends and the compaction swap hold an advisory lock on a sibling
+    .lock file, so overlapping runs (cron plus a manual dispatch) can share
+    one log: every append is fsynced, and a compaction merges whatever other
+    processes appended before it atomically renames the rewritten file.
+    """
+    
+    def __init__(self, path: str, retention: int = 0, legacy_path: Optional[str] = None,
+                 compact_min_bytes: int = 64 * 1024):
+        self.path = path
+        self.retention = max(0, retention)
+        self.compact_min_bytes = compact_min_bytes
+        self.meta_path = path + '.compacted'
+        self.lock_path = path + '.lock'
+        # Serializes appends with the final swap of a compaction; the file
+        # lock in _locked() does the same across processes
+        self.lock = threading.Lock()
+        self._compactor: Optional[threading.Thread] = None
+        # Every content ever posted, built on the first contains() call
+        self._contents: Optional[set] = None
+        if legacy_path and os.path.exists(legacy_path) and not os.path.exists(path):
+            self._migrate(legacy_path)
+        self.maybe_compact()
+    
+    @contextmanager
+    def _locked(self):
+        """Hold the log's lock within this process and, where fcntl exists, across processes"""
+        with self.lock:
+            with open(self.lock_path, 'a') as lock_file:
+                if fcntl is not None:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    if fcntl is not None:
+                        fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+    
+    def _replace(self, tmp_path: str):
+        """Atomically move a fully written, fsynced file over the log"""
+        os.replace(tmp_path, self.path)
+        if hasattr(os, 'O_DIRECTORY'):
+            # Make the rename itself survive a crash
+            fd = os.open(os.path.dirname(os.path.abspath(self.path)), os.O_RDONLY | os.O_DIRECTORY)
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+    
+    def _migrate(self, legacy_path: str):
+        """Convert a post_history.json document into the log"""
+        try:
+            with open(legacy_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            timestamp = data.get('last_updated')
+            with self._locked():
+                if os.path.exists(self.path):
+                    # Another run migrated it first
+                    return
+                tmp_path = f"{self.path}.{os.getpid()}.tmp"
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    for content in data.get('posts', []):
+                        f.write(json.dumps({'timestamp': timestamp, 'content': content}, ensure_ascii=False) + '\n')
+                    f.flush()
+                    os.fsync(f.fileno())
+                self._replace(tmp_path)
+            logger.info(f"Migrated {len(data.get('posts', []))} posts from {legacy_path} to {self.path}")
+        except Exception as e:
+            logger.error(f"Error migrating post history from {legacy_path}: {e}")
+    
+    @staticmethod
+    def _parse(lines) -> List[Dict[str, Any]]:
+        records = []
+        for line in lines:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # Torn write or manual edit; compaction removes it
+                continue
+            if isinstance(record, dict) and 'content' in record:
+                records.append(record)
+        return records
+    
+    def load(self) -> List[PostRecord]:
+        """All valid records, oldest first"""
+        if not os.path.exists(self.path):
+            return []
+        with open(self.path, 'r', encoding='utf-8') as f:
+            return [PostRecord.from_dict(record) for record in self._parse(f)]
+    
+    def _reversed_lines(self, block_size: int = 64 * 1024):
+        """Lines of the log from last to first, read in blocks from the end"""
+        with open(self.path, 'rb') as f:
+            position = f.seek(0, os.SEEK_END)
+            partial = b''
+            while position > 0:
+                step = min(block_size, position)
+                position -= step
+                f.seek(position)
+                lines = (f.read(step) + partial).split(b'\n')
+                # The first line may continue in the previous block
+                partial = lines.pop(0)
+                for line in reversed(lines):
+                    if line:
+                        yield line
+            if partial:
+                yield partial
+    
+    def recent(self, n: int, account: Optional[str] = None) -> List[PostRecord]:
+        """The last n records, oldest first, optionally for one account
+        
+        Reads backwards from the end of the file, so the cost depends on n
+        rather than on the size of the history.
+        """
+        if n <= 0 or not os.path.exists(self.path):
+            return []
+        records = []
+        for line in self._reversed_lines():
+            for record in self._parse([line.decode('utf-8', errors='replace')]):
+                if account is None or record.get('account') == account:
+                    records.append(PostRecord.from_dict(record))
+            if len(records) >= n:
+                break
+        return records[::-1]
+    
+    def contents(self):
+        """Content of every record, oldest first"""
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'r', encoding='utf-8', errors='replace') as f:
+            for line in f:
+                for record in self._parse([line]):
+                    yield record['content']
+    
+    def contains(self, content: str) -> bool:
+        """Whether exactly this content was posted before"""
+        if self._contents is None:
+            self._contents = set(self.contents())
+        return content in self._contents
+    
+    @staticmethod
+    def _fingerprint(f, offset: int) -> str:
+        """Hash of the bytes just before offset"""
+        start = max(0, offset - 4096)
+        f.seek(start)
+        return hashlib.sha1(f.read(offset - start)).hexdigest()
+    
+    def since(self, marker: Optional[List[Any]] = None) -> Optional[Tuple[List[str], List[Any]]]:
+        """Content appended after marker, and the marker of the new end
+        
+        A marker is the offset of the end of the last whole line read plus a
+        hash of the bytes before it. If the log was compacted or replaced
+        since, the hash no longer matches and None is returned; start over
+        with marker None, which reads the whole log.
+        """
+        offset, fingerprint = marker or (0, None)
+        if not os.path.exists(self.path):
+            return None if offset else ([], [0, hashlib.sha1().hexdigest()])
+        with open(self.path, 'rb') as f:
+            size = f.seek(0, os.SEEK_END)
+            if marker and (offset > size or self._fingerprint(f, offset) != fingerprint):
+                return None
+            f.seek(offset)
+            data = f.read(size - offset)
+            # A line without its newline is still being written
+            end = data.rfind(b'\n') + 1
+            offset += end
+            fingerprint = self._fingerprint(f, offset)
+        records = self._parse(data[:end].decode('utf-8', errors='replace').splitlines())
+        return [record['content'] for record in records], [offset, fingerprint]
+    
+    def append(self, record: PostRecord):
+        """Add one record to the end of the log"""
+        line = (json.dumps(record.to_dict(), ensure_ascii=False) + '\n').encode('utf-8')
+        with self._locked():
+            with open(self.path, 'a+b') as f:
+                if f.seek(0, os.SEEK_END) > 0:
+                    f.seek(-1, os.SEEK_END)
+                    if f.read(1) != b'\n':
+                        # A crashed run left a torn line; don't glue this record onto it
+                        line = b'\n' + line
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+        if self._contents is not None:
+            self._contents.add(record.content)
+        # Long-running processes (daemon mode) compact as the log grows too
+        self.maybe_compact()
+    
+    def _compacted_size(self) -> int:
+        try:
+            with open(self.meta_path, 'r') as f:
+                return int(f.read().strip() or 0)
+        except (OSError, ValueError):
+            return 0
+    
+    def maybe_compact(self) -> bool:
+        """Start a background compaction if the log has doubled since the last one"""
+        if self._compactor is not None and self._compactor.is_alive():
+            return False
+        try:
+            size = os.path.getsize(self.path)
+        except OSError:
+            return False
+        if size < max(self.compact_min_bytes, 2 * self._compacted_size()):
+            return False
+        self._compactor = threading.Thread(target=self.compact, name='history-compaction')
+        self._compactor.start()
+        return True
+    
+    def compact(self) -> int:
+        """Rewrite the log without corrupt lines and duplicates; returns records kept"""
+        try:
+            with self._locked():
+                stat = os.stat(self.path)
+                snapshot = stat.st_size
+                with open(self.path, 'rb') as f:
+                    data = f.read(snapshot)
+            records = []
+            seen = set()
+            for record in self._parse(data.decode('utf-8', errors='replace').splitlines()):
+                key = json.dumps(record, sort_keys=True, ensure_ascii=False)
+                if key not in seen:
+                    seen.add(key)
+                    records.append(record)
+            if self.retention:
+                records = records[-self.retention:]
+            # Per-process name so two runs compacting at once don't share it
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                for record in records:
+                    f.write(json.dumps(record, ensure_ascii=False) + '\n')
+            with self._locked():
+                current = os.stat(self.path)
+                if current.st_ino != stat.st_ino or current.st_size < snapshot:
+                    # Another run compacted the log meanwhile; its rewrite
+                    # already holds everything in our snapshot
+                    os.remove(tmp_path)
+                    logger.info("Post history was compacted by another run, skipping")
+                    return 0
+                # Merge in anything appended, by this or another run, while
+                # the snapshot was compacted
+                with open(self.path, 'rb') as src, open(tmp_path, 'ab') as dst:
+                    src.seek(snapshot)
+                    tail = src.read()
+                    if tail and data and not data.endswith(b'\n'):
+                        # The snapshot ended in a torn line the append completed
+                        tail = tail[tail.find(b'\n') + 1:]
+                    dst.write(tail)
+                    dst.flush()
+                    os.fsync(dst.fileno())
+                self._replace(tmp_path)
+                size = os.path.getsize(self.path)
+            meta_tmp = f"{self.meta_path}.{os.getpid()}.tmp"
+            with open(meta_tmp, 'w') as f:
+                f.write(str(size))
+            os.replace(meta_tmp, self.meta_path)
+            logger.info(f"Compacted post history to {len(records)} records ({snapshot} -> {size} bytes)")
+            return len(records)
+        except Exception as e:
+            logger.error(f"Error compacting post history: {e}")
+            return 0
+    
+    def close(self):
+        """Wait for a running compaction to finish"""
+        if self._compactor is not None:
+            self._compactor.join()
+
+class PostHistoryStore:
+    """SQLite post history with indexed queries and unbounded retention
+    
+    WAL mode with synchronous=NORMAL keeps an insert well under a millisecond
+    at millions of rows; timestamp, topic, account and tweet ID are indexed,
+    and content lookups go through an indexed hash instead of the text.
+    """
+    
+    COLUMNS = PostRecord.__slots__
+    # Columns added after the table was introduced, with their types
+    METRIC_COLUMNS = (('model', 'TEXT'), ('prompt_tokens', 'INTEGER'), ('completion_tokens', 'INTEGER'),
+                      ('generation_latency', 'REAL'), ('post_latency', 'REAL'))
+    
+    def __init__(self, path: str, legacy_path: Optional[str] = None):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Overlapping runs wait for each other's writes instead of failing
+        self.conn = sqlite3.connect(path, timeout=30)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        with self.conn:
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS posts ("
+                " id INTEGER PRIMARY KEY,"
+                " timestamp TEXT NOT NULL,"
+                " account TEXT,"
+                " topic TEXT,"
+                " tweet_id TEXT,"
+                " content TEXT NOT NULL,"
+                " content_hash INTEGER NOT NULL)"
+            )
+            columns = {row['name'] for row in self.conn.execute("PRAGMA table_info(posts)")}
+            for column, kind in self.METRIC_COLUMNS:
+                if column not in columns:
+                    self.conn.execute(f"ALTER TABLE posts ADD COLUMN {column} {kind}")
+            for name, columns in (('timestamp', 'timestamp'), ('topic', 'topic, timestamp'),
+                                  ('account', 'account, timestamp'), ('tweet_id', 'tweet_id'),
+                                  ('content_hash', 'content_hash')):
+                self.conn.execute(f"CREATE INDEX IF NOT EXISTS posts_{name} ON posts ({columns})")
+        if legacy_path and os.path.exists(legacy_path) and not self.count():
+            self._migrate(legacy_path)
+    
+    def _migrate(self, legacy_path: str):
+        """Import the records of a JSONL history log"""
+        with open(legacy_path, 'r', encoding='utf-8') as f:
+            records = [PostRecord.from_dict(record) for record in PostHistoryLog._parse(f)]
+        with self.conn:
+            self.conn.executemany(self.INSERT_POST, [self._row(record) for record in records])
+        logger.info(f"Imported {len(records)} posts from {legacy_path} into {self.path}")
+    
+    @staticmethod
+    def _hash(content: str) -> int:
+        return int.from_bytes(hashlib.sha1(content.encode('utf-8')).digest()[:8], 'big', signed=True)
+    
+    INSERT_POST = (f"INSERT INTO posts ({', '.join(COLUMNS)}, content_hash)"
+                   f" VALUES ({', '.join('?' * (len(COLUMNS) + 1))})")
+    
+    def _row(self, record: PostRecord) -> Tuple:
+        values = {column: getattr(record, column) for column in self.COLUMNS}
+        values['timestamp'] = record.timestamp or datetime.now().isoformat()
+        return (*values.values(), self._hash(record.content))
+    
+    def _records(self, rows) -> List[PostRecord]:
+        return [PostRecord(**{column: row[column] for column in self.COLUMNS}) for row in rows]
+    
+    def append(self, record: PostRecord):
+        """Insert one posted tweet"""
+        with self.conn:
+            self.conn.execute(self.INSERT_POST, self._row(record))
+    
+    def recent(self, n: int, account: Optional[str] = None) -> List[PostRecord]:
+        """The last n posts, oldest first, optionally for one account"""
+        if account is None:
+            rows = self.conn.execute("SELECT * FROM posts ORDER BY timestamp DESC, id DESC LIMIT ?", (n,))
+        else:
+            rows = self.conn.execute(
+                "SELECT * FROM posts WHERE account = ? ORDER BY timestamp DESC, id DESC LIMIT ?", (account, n)
+            )
+        return self._records(rows)[::-1]
+    
+    def contains(self, content: str) -> bool:
+        """Whether exactly this content was posted before"""
+        row = self.conn.execute(
+            "SELECT 1 FROM posts WHERE content_hash = ? AND content = ? LIMIT 1",
+            (self._hash(content), content)
+        ).fetchone()
+        return row is not None
+    
+    def contents(self):
+        """Content of every post, oldest first"""
+        return (row[0] for row in self.conn.execute("SELECT content FROM posts ORDER BY id"))
+    
+    def since(self, marker: Optional[List[Any]] = None) -> Optional[Tuple[List[str], List[Any]]]:
+        """Content inserted after marker, and the marker of the newest post
+        
+        A marker is the last post's id and content hash; None is returned
+        when that post is gone (the database was replaced), so the caller
+        starts over with marker None.
+        """
+        last_id, content_hash = marker or (0, None)
+        if marker and last_id:
+            row = self.conn.execute("SELECT content_hash FROM posts WHERE id = ?", (last_id,)).fetchone()
+            if row is None or row[0] != content_hash:
+                return None
+        rows = self.conn.execute(
+            "SELECT id, content, content_hash FROM posts WHERE id > ? ORDER BY id", (last_id,)
+        ).fetchall()
+        if rows:
+            last_id, content_hash = rows[-1][0], rows[-1][2]
+        return [row[1] for row in rows], [last_id, content_hash]
+    
+    def by_tweet_id(self, tweet_id: str) -> Optional[PostRecord]:
+        rows = self._records(self.conn.execute("SELECT * FROM posts WHERE tweet_id = ? LIMIT 1", (tweet_id,)))
+        return rows[0] if rows else None
+    
+    def between(self, start: str, end: str, account: Optional[str] = None,
+                topic: Optional[str] = None) -> List[PostRecord]:
+        """Posts with start <= timestamp < end (ISO strings), oldest first"""
+        query = "SELECT * FROM posts WHERE timestamp >= ? AND timestamp < ?"
+        params: List[Any] = [start, end]
+        if account is not None:
+            query += " AND account = ?"
+            params.append(account)
+        if topic is not None:
+            query += " AND topic = ?"
+            params.append(topic)
+        return self._records(self.conn.execute(query + " ORDER BY timestamp, id", params))
+    
+    def count(self, account: Optional[str] = None, since: Optional[str] = None) -> int:
+        """Number of posts, optionally for one account and/or since an ISO timestamp"""
+        query = "SELECT COUNT(*) FROM posts WHERE 1 = 1"
+        params: List[Any] = []
+        if account is not None:
+            query += " AND account = ?"
+            params.append(account)
+        if since is not None:
+            query += " AND timestamp >= ?"
+            params.append(since)
+        return self.conn.execute(query, params).fetchone()[0]
+    
+    def topic_counts(self, since: Optional[str] = None) -> Dict[str, int]:
+        """Posts per topic, optionally since an ISO timestamp"""
+        rows = self.conn.execute(
+            "SELECT topic, COUNT(*) FROM posts WHERE timestamp >= ? GROUP BY topic", (since or '',)
+        )
+        return {topic: count for topic, count in rows}
+    
+    def close(self):
+        self.conn.close()
+
+def create_history_store(config: Dict[str, Any]):
+    """The post history backend selected in config ('jsonl' or 'sqlite')"""
+    if config.get('history_backend', 'jsonl') == 'sqlite':
+        return PostHistoryStore(
+            config.get('history_db_path', os.path.join('.agent_state', 'post_history.db')),
+            legacy_path=config.get('history_path', 'post_history.jsonl')
+        )
+    return PostHistoryLog(
+        config.get('history_path', 'post_history.jsonl'),
+        config.get('history_retention', 0),
+        legacy_path=config.get('legacy_history_path')
+    )
+
+class MinHashIndex:
+    """MinHash signatures with LSH banding for near-duplicate lookup
+    
+    Posts are reduced to sets of lowercased word shingles, and the Jaccard
+    similarity of two sets is estimated from their MinHash signatures. The
+    signatures use one-permutation hashing: each shingle is hashed once into
+    one of num_perm bins, and empty bins are filled by rotation. This keeps a
+    signature linear in the post length. Signatures are split into bands, and
+    only posts that share a whole band with the query are compared, so a
+    lookup costs one signature plus a few bucket probes however many posts
+    are indexed. With the defaults (16 bands of 4 rows), pairs above roughly
+    0.5 similarity are found.
+    
+    Signatures and band keys are kept in SQLite, on disk at path or in
+    memory, so a saved index is used without reading the history again;
+    catch_up() indexes only the posts written since it last ran.
+    """
+    
+    _EMPTY = 1 << 64
+    _MASK = (1 << 64) - 1
+    # Odd multiplier that keeps borrowed (densified) bin values distinct
+    _SPREAD = 0x9E3779B97F4A7C15
+    
+    def __init__(self, num_perm: int = 64, bands: int = 16, shingle_size: int = 3, path: str = ':memory:'):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        self.path = path
+        directory = os.path.dirname(path) if path != ':memory:' else ''
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.conn = sqlite3.connect(path, timeout=30)
+        with self.conn:
+            self.conn.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT NOT NULL)")
+            self.conn.execute("CREATE TABLE IF NOT EXISTS signatures (id INTEGER PRIMARY KEY, signature BLOB NOT NULL)")
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS bands (key INTEGER NOT NULL, id INTEGER NOT NULL,"
+                " PRIMARY KEY (key, id)) WITHOUT ROWID"
+            )
+            params = [num_perm, bands, shingle_size]
+            if self._get('params') != params:
+                # Signatures made with other parameters are not comparable
+                self._clear()
+                self._set('params', params)
+    
+    def close(self):
+        self.conn.close()
+    
+    def _get(self, name: str) -> Any:
+        row = self.conn.execute("SELECT value FROM meta WHERE name = ?", (name,)).fetchone()
+        return json.loads(row[0]) if row else None
+    
+    def _set(self, name: str, value: Any):
+        self.conn.execute("INSERT OR REPLACE INTO meta (name, value) VALUES (?, ?)", (name, json.dumps(value)))
+    
+    def _clear(self):
+        self.conn.execute("DELETE FROM signatures")
+        self.conn.execute("DELETE FROM bands")
+        self.conn.execute("DELETE FROM meta WHERE name = 'marker'")
+    
+    def __len__(self) -> int:
+        return self.conn.execute("SELECT COALESCE(MAX(id), 0) FROM signatures").fetchone()[0]
+    
+    def _shingles(self, text: str) -> set:
+        words = re.findall(r'\w+', text.lower())
+        size = min(self.shingle_size, len(words)) or 1
+        return {' '.join(words[i:i + size]) for i in range(max(1, len(words) - size + 1))}
+    
+    def signature(self, text: str) -> Tuple[int, ...]:
+        num_perm = self.num_perm
+        bins = [self._EMPTY] * num_perm
+        for shingle in self._shingles(text):
+            value = int.from_bytes(hashlib.blake2b(shingle.encode('utf-8'), digest_size=8).digest(), 'little')
+            slot = value % num_perm
+            if value < bins[slot]:
+                bins[slot] = value
+        # Rotation densification: an empty bin borrows the nearest filled bin
+        # to its right, mixed with the distance so borrowed values stay distinct
+        filled = list(bins)
+        for slot in range(num_perm):
+            if filled[slot] == self._EMPTY:
+                for distance in range(1, num_perm):
+                    value = filled[(slot + distance) % num_perm]
+                    if value < self._EMPTY:
+                        bins[slot] = (value + distance * self._SPREAD) & self._MASK
+                        break
+        return tuple(bins)
+    
+    def _band_keys(self, signature: Tuple[int, ...]) -> List[int]:
+        """One signed 64-bit key per band, distinct across bands"""
+        rows = self.rows
+        return [
+            int.from_bytes(hashlib.blake2b(
+                struct.pack(f'<B{rows}Q', band, *signature[band * rows:(band + 1) * rows]), digest_size=8
+            ).digest(), 'little', signed=True)
+            for band in range(self.bands)
+        ]
+    
+    def _insert(self, texts):
+        index = len(self)
+        signatures, bands = [], []
+        for text in texts:
+            index += 1
+            signature = self.signature(text)
+            signatures.append((index, struct.pack(f'<{self.num_perm}Q', *signature)))
+            bands.extend((key, index) for key in self._band_keys(signature))
+        self.conn.executemany("INSERT INTO signatures (id, signature) VALUES (?, ?)", signatures)
+        self.conn.executemany("INSERT INTO bands (key, id) VALUES (?, ?)", bands)
+    
+    def add(self, text: str):
+        with self.conn:
+            self._insert([text])
+    
+    def catch_up(self, since: Callable[[Optional[List[Any]]], Any]) -> int:
+        """Index the posts written since the last catch-up; returns how many
+        
+        since(marker) is a history store's since(). When the history was
+        rewritten (e.g. compacted) since the last catch-up, the index is
+        rebuilt from the whole history.
+        """
+        with self.conn:
+            # Take the write lock first so overlapping runs don't index a post twice
+            self.conn.execute("BEGIN IMMEDIATE")
+            marker = self._get('marker')
+            result = since(marker) if marker else None
+            if result is None:
+                if marker:
+                    logger.info("Post history was rewritten, rebuilding the near-duplicate index")
+                self._clear()
+                result = since(None)
+            contents, marker = result
+            self._insert(contents)
+            self._set('marker', marker)
+        return len(contents)
+    
+    def similarity(self, text: str) -> float:
+        """Highest estimated Jaccard similarity to any indexed post (0.0 if none)"""
+        signature = self.signature(text)
+        keys = self._band_keys(signature)
+        rows = self.conn.execute(
+            "SELECT signature FROM signatures WHERE id IN"
+            f" (SELECT id FROM bands WHERE key IN ({', '.join('?' * len(keys))}))",
+            keys
+        )
+        best = 0.0
+        for (blob,) in rows:
+            other = struct.unpack(f'<{self.num_perm}Q', blob)
+            matches = sum(1 for a, b in zip(signature, other) if a == b)
+            best = max(best, matches / len(signature))
+        return best
+
+class TfidfIndex:
+    """Hashed TF-IDF vectors of past posts for batched cosine similarity
+    
+    Words and adjacent word pairs are hashed into n_features buckets and
+    weighted by sublinear TF times IDF, then each post vector is normalized.
+    The vectors are stored as posting lists per feature. A batch of
+    candidates is scored against every post with one gather and one bincount,
+    which only touches the postings of the candidates' features. Features
+    found in more than max_df of the posts carry little signal and are skipped
+    at query time. NumPy is imported when the index is built.
+    
+    save() writes the posting lists to a directory and load() memory-maps
+    them back, so a saved index opens in constant time; posts written since
+    are added with catch_up(). A post's weights use the IDF at the time it
+    was indexed.
+    """
+    
+    # Posts added after the build are folded into the posting lists once
+    # there are this many
+    MERGE_EVERY = 256
+    
+    def __init__(self, texts, n_features: int = 1 << 18, max_df: float = 0.5,
+                 marker: Optional[List[Any]] = None):
+        import numpy as np
+        self.np = np
+        self.n_features = n_features
+        self.max_df = max_df
+        # History position (see PostHistoryLog.since) the index covers
+        self.marker = marker
+        features, doc_ids, counts = [], [], []
+        for doc_id, text in enumerate(texts):
+            for feature, count in self._features(text).items():
+                features.append(feature)
+                doc_ids.append(doc_id)
+                counts.append(count)
+        n_docs = doc_id + 1 if features else 0
+        features = np.asarray(features, dtype=np.int64)
+        doc_ids = np.asarray(doc_ids, dtype=np.int64)
+        df = np.bincount(features, minlength=n_features)
+        idf = np.log((1 + n_docs) / (1 + df)) + 1
+        weights = (1 + np.log(np.asarray(counts, dtype=np.float64))) * idf[features]
+        norms = np.sqrt(np.bincount(doc_ids, weights=weights ** 2, minlength=n_docs))
+        weights /= norms[doc_ids]
+        order = np.argsort(features, kind='stable')
+        self._set_postings(doc_ids[order], weights[order], df, n_docs)
+        # Posts added after the build, scored directly
+        self.extra: List[Tuple[Any, Any]] = []
+    
+    def _set_postings(self, posting_docs, posting_weights, df, n_docs: int):
+        np = self.np
+        self.n_docs = n_docs
+        self.df = df
+        self.idf = np.log((1 + n_docs) / (1 + df)) + 1
+        # Posting lists: the docs and weights of feature f live in
+        # [indptr[f], indptr[f + 1])
+        self.posting_docs = posting_docs
+        self.posting_weights = posting_weights
+        self.indptr = np.concatenate(([0], np.cumsum(df)))
+    
+    def merge(self):
+        """Fold the posts added since the build into the posting lists"""
+        if not self.extra:
+            return
+        np = self.np
+        features = np.concatenate([features for features, _ in self.extra])
+        weights = np.concatenate([weights for _, weights in self.extra])
+        docs = np.repeat(np.arange(self.n_docs, self.n_docs + len(self.extra)),
+                         [len(features) for features, _ in self.extra])
+        order = np.argsort(features, kind='stable')
+        features, weights, docs = features[order], weights[order], docs[order]
+        # New postings go to the end of their feature's list, keeping docs sorted
+        positions = self.indptr[features + 1]
+        self._set_postings(
+            np.insert(self.posting_docs, positions, docs),
+            np.insert(self.posting_weights, positions, weights),
+            self.df + np.bincount(features, minlength=self.n_features),
+            self.n_docs + len(self.extra)
+        )
+        self.extra = []
+    
+    def save(self, directory: str):
+        """Write the index to directory, replacing the snapshot saved before"""
+        np = self.np
+        self.merge()
+        os.makedirs(directory, exist_ok=True)
+        # Arrays are written under a fresh name and the metadata that points
+        # at them is swapped in last, so readers never see a mix of snapshots
+        token = f"{time.time_ns()}-{os.getpid()}"
+        for name in ('posting_docs', 'posting_weights', 'df'):
+            np.save(os.path.join(directory, f"{name}.{token}.npy"), getattr(self, name))
+        meta_path = os.path.join(directory, 'meta.json')
+        tmp_path = f"{meta_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({'token': token, 'n_docs': self.n_docs, 'n_features': self.n_features,
+                       'max_df': self.max_df, 'marker': self.marker}, f)
+        os.replace(tmp_path, meta_path)
+        for name in os.listdir(directory):
+            if name.endswith('.npy') and f".{token}." not in name:
+                try:
+                    os.remove(os.path.join(directory, name))
+                except OSError:
+                    pass
+    
+    @classmethod
+    def load(cls, directory: str, n_features: int = 1 << 18, max_df: float = 0.5) -> Optional['TfidfIndex']:
+        """Memory-map an index written by save(), or None if there is none"""
+        index = cls([], n_features, max_df)
+        np = index.np
+        try:
+            with open(os.path.join(directory, 'meta.json'), 'r') as f:
+                meta = json.load(f)
+            if meta['n_features'] != n_features:
+                return None
+            arrays = [
+                np.load(os.path.join(directory, f"{name}.{meta['token']}.npy"), mmap_mode='r')
+                for name in ('posting_docs', 'posting_weights', 'df')
+            ]
+        except (OSError, ValueError, KeyError) as e:
+            logger.debug(f"No usable TF-IDF index in {directory}: {e}")
+            return None
+        index._set_postings(*arrays, meta['n_docs'])
+        index.marker = meta['marker']
+        return index
+    
+    def catch_up(self, since: Callable[[Optional[List[Any]]], Any]) -> bool:
+        """Add the posts written since the index's marker
+        
+        Returns False when the history was rewritten since, in which case
+        the index has to be rebuilt.
+        """
+        result = since(self.marker) if self.marker else None
+        if result is None:
+            return False
+        contents, self.marker = result
+        for content in contents:
+            self.add(content)
+        return True
+    
+    def __len__(self) -> int:
+        return self.n_docs + len(self.extra)
+    
+    def _features(self, text: str) -> Dict[int, int]:
+        words = re.findall(r'\w+', text.lower())
+        counts: Dict[int, int] = {}
+        for token in words + [f"{a} {b}" for a, b in zip(words, words[1:])]:
+            feature = zlib.crc32(token.encode('utf-8')) % self.n_features
+            counts[feature] = counts.get(feature, 0) + 1
+        return counts
+    
+    def _vector(self, text: str):
+        np = self.np
+        counts = self._features(text)
+        features = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+        weights = (1 + np.log(np.fromiter(counts.values(), dtype=np.float64, count=len(counts)))) * self.idf[features]
+        norm = np.sqrt((weights ** 2).sum())
+        return features, weights / norm if norm else weights
+    
+    def add(self, text: str):
+        self.extra.append(self._vector(text))
+    
+    def similarities(self, texts: List[str]):
+        """Highest cosine similarity of each text to any indexed post"""
+        np = self.np
+        n_docs = self.n_docs
+        best = np.zeros(len(texts))
+        if not texts:
+            return best
+        vectors = [self._vector(text) for text in texts]
+        features = np.concatenate([features for features, _ in vectors])
+        values = np.concatenate([values for _, values in vectors])
+        rows = np.repeat(np.arange(len(texts)), [len(features) for features, _ in vectors])
+        max_df = max(self.max_df * n_docs, 1)
+        keep = self.df[features] <= max_df
+        features, values, rows = features[keep], values[keep], rows[keep]
+        # Gather the postings of every (candidate, feature) pair, shift the
+        # doc ids into the candidate's row and scale by the candidate weight
+        starts = self.indptr[features].tolist()
+        ends = self.indptr[features + 1].tolist()
+        lengths = self.indptr[features + 1] - self.indptr[features]
+        if lengths.sum():
+            docs = np.concatenate([self.posting_docs[start:end] for start, end in zip(starts, ends)])
+            docs += np.repeat(rows * n_docs, lengths)
+            weights = np.concatenate([self.posting_weights[start:end] for start, end in zip(starts, ends)])
+            weights *= np.repeat(values, lengths)
+            scores = np.bincount(docs, weights=weights, minlength=len(texts) * n_docs)
+            best = scores.reshape(len(texts), n_docs).max(axis=1)
+        # Posts not merged yet are scored on the same features as the postings
+        for row, (features, values) in enumerate(vectors):
+            kept = self.df[features] <= max_df
+            lookup = dict(zip(features[kept].tolist(), values[kept].tolist()))
+            for extra_features, extra_values in self.extra:
+                score = sum(lookup.get(f, 0.0) * v for f, v in zip(extra_features.tolist(), extra_values.tolist()))
+                best[row] = max(best[row], score)
+        return best
+
+class LatencyTracker:
+    """Rolling window of request latencies with percentile lookup
+    
+    Samples are persisted to a small JSON file when a path is given, so
+    one-shot cron runs still learn the latency distribution over time.
+    """
+    
+    def __init__(self, path: Optional[str] = None, window: int = 200):
+        self.path = path
+        self.samples: deque = deque(maxlen=window)
+        self._load()
+    
+    def _load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self.samples.extend(float(sample) for sample in json.load(f))
+        except Exception as e:
+            logger.warning(f"Could not load latency samples: {e}")
+    
+    def record(self, seconds: float):
+        """Add a sample and persist the window"""
+        self.samples.append(seconds)
+        if not self.path:
+            return
+        try:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump([round(sample, 4) for sample in self.samples], f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.warning(f"Could not save latency samples: {e}")
+    
+    def percentile(self, fraction: float) -> Optional[float]:
+        """Latency below which the given fraction of samples fall (nearest rank)"""
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        rank = min(len(ordered), max(1, math.ceil(fraction * len(ordered))))
+        return ordered[rank - 1]
+
+class ContentGenerator:
+    """Handles content generation using Gemini API"""
+    
+    def __init__(self, api_key: str, max_concurrency: int = 4, cache: Optional[ResponseCache] = None,
+                 stream: bool = True, fallback_pool: Optional[FallbackPool] = None,
+                 hedge_model: Optional[str] = None, hedge_percentile: float = 0.95,
+                 hedge_delay: float = 5.0, latency_tracker: Optional[LatencyTracker] = None,
+                 model_factory: Optional[Callable[[str], Any]] = None):
+        if model_factory is None:
+            with run_timer.phase('import'):
+                import google.generativeai as genai
+            genai.configure(api_key=api_key)
+            model_factory = genai.GenerativeModel
+        with run_timer.phase('client_init'):
+            self.model_name = 'gemini-1.5-flash'
+            self.model = model_factory(self.model_name)
+            # Alternate model raced against slow primary requests
+            self.hedge_model_name = hedge_model
+            self.hedge_model = model_factory(hedge_model) if hedge_model else None
+        # Hedge once a request outlives this percentile of past latencies,
+        # or hedge_delay seconds until enough samples have been collected
+        self.hedge_percentile = hedge_percentile
+        self.hedge_delay = hedge_delay
+        self.latency = latency_tracker or LatencyTracker()
+        # Upper bound on in-flight Gemini requests for generate_candidates
+        self.max_concurrency = max(1, max_concurrency)
+        self.cache = cache
+        # Stream responses and stop reading once the tweet budget is exceeded
+        self.stream = stream
+        self.fallback_pool = fallback_pool
+    
+    def _build_prompt(self, topic: str, time_context: str = "", additional_context: str = "",
+                      max_length: int = MAX_TWEET_LENGTH) -> str:
+        """Render the generation prompt for a topic"""
+        # Determine time-based context, falling back to the clock
+        if time_context in ('morning', 'evening'):
+            is_morning = time_context == 'morning'
+        else:
+            is_morning = datetime.now().hour < 12
+        if is_morning:
+            time_hashtag = "#MorningMotivation"
+        else:
+            time_hashtag = "#EveningThoughts"
+        
+        return f"""
             Create an engaging Twitter/X post about {topic}.
             
             Context: This is a {time_context} post.
             
             Guidelines:
-            - Keep it under 280 characters
+            - Keep it under {max_length} characters
             - Make it informative and engaging
             - Include relevant hashtags (2-3 max)
             - Use a conversational tone
@@ -51,157 +1598,1320 @@ class ContentGenerator:
             
             Return only the tweet text, nothing else.
             """
+    
+    async def _request(self, prompt: str, variant: int = 0, use_cache: bool = True,
+                       max_length: int = MAX_TWEET_LENGTH) -> Dict[str, Any]:
+        """Send a single prompt to Gemini and return the raw response
+        
+        The result holds the response 'text', the answering 'model', its
+        'prompt_tokens' and 'completion_tokens' (0 for a cached response,
+        None when not reported) and the 'latency' in seconds. Responses are
+        served from the cache when one is configured; variant keeps
+        concurrently generated candidates for one prompt apart.
+        """
+        start = time.perf_counter()
+        cache_key = None
+        if self.cache and use_cache:
+            cache_key = ResponseCache.make_key(self.model_name, prompt, variant)
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                logger.info("Using cached Gemini response")
+                return {
+                    'text': cached,
+                    'model': self.model_name,
+                    'prompt_tokens': 0,
+                    'completion_tokens': 0,
+                    'latency': time.perf_counter() - start
+                }
+        
+        if self.hedge_model:
+            response = await self._request_hedged(prompt, max_length)
+        else:
+            response = await self._call_model(self.model, prompt, max_length)
+        response['latency'] = time.perf_counter() - start
+        self.latency.record(response['latency'])
+        
+        if cache_key:
+            self.cache.put(cache_key, response['text'])
+        return response
+    
+    @staticmethod
+    def _usage(response) -> Tuple[Optional[int], Optional[int]]:
+        """Prompt and completion token counts reported with a response"""
+        try:
+            usage = response.usage_metadata
+        except Exception:
+            # Not reported, or a stream cancelled before it was
+            return None, None
+        return (getattr(usage, 'prompt_token_count', None) or None,
+                getattr(usage, 'candidates_token_count', None) or None)
+    
+    async def _call_model(self, model, prompt: str, max_length: int = MAX_TWEET_LENGTH) -> Dict[str, Any]:
+        """Run one generation request against model"""
+        # Native async call: an in-flight request costs a coroutine, not an
+        # executor thread, so concurrency is bounded only by max_concurrency
+        if self.stream:
+            text, response = await self._request_stream(model, prompt, max_length)
+        else:
+            response = await model.generate_content_async(prompt)
+            text = response.text
+        prompt_tokens, completion_tokens = self._usage(response)
+        return {
+            'text': text,
+            'model': self.model_name if model is self.model else self.hedge_model_name,
+            'prompt_tokens': prompt_tokens,
+            'completion_tokens': completion_tokens
+        }
+    
+    def _hedge_after(self) -> float:
+        """Seconds to wait for the primary model before hedging"""
+        if len(self.latency.samples) < 20:
+            return self.hedge_delay
+        return self.latency.percentile(self.hedge_percentile)
+    
+    async def _request_hedged(self, prompt: str, max_length: int = MAX_TWEET_LENGTH) -> Dict[str, Any]:
+        """Race the primary model against the hedge model once it is slow
+        
+        The hedge request is only sent when the primary has not answered
+        within the hedge delay (or has already failed). The first successful
+        answer wins and the other request is cancelled.
+        """
+        delay = self._hedge_after()
+        primary = asyncio.create_task(self._call_model(self.model, prompt, max_length))
+        pending = {primary}
+        errors = []
+        try:
+            done, pending = await asyncio.wait(pending, timeout=delay)
+            if primary in done:
+                if primary.exception() is None:
+                    return primary.result()
+                errors.append(primary.exception())
+                logger.warning(f"{self.model_name} failed ({primary.exception()}), hedging with {self.hedge_model_name}")
+            else:
+                logger.info(f"No answer from {self.model_name} after {delay:.2f}s, hedging with {self.hedge_model_name}")
+            pending.add(asyncio.create_task(self._call_model(self.hedge_model, prompt, max_length)))
             
-            response = await asyncio.to_thread(
-                self.model.generate_content, prompt
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        winner = self.model_name if task is primary else self.hedge_model_name
+                        logger.info(f"Hedged request answered by {winner}")
+                        return task.result()
+                    errors.append(task.exception())
+            raise errors[-1]
+        finally:
+            for task in pending:
+                task.cancel()
+    
+    async def _request_stream(self, model, prompt: str, max_length: int = MAX_TWEET_LENGTH):
+        """Stream a response, cancelling it once the text exceeds max_length
+        
+        Anything past the budget would be truncated anyway, so there is no
+        point waiting for (and paying for) the rest of the output. Returns
+        the text and the response object.
+        """
+        response = await model.generate_content_async(prompt, stream=True)
+        chunks = []
+        try:
+            async for chunk in response:
+                try:
+                    chunks.append(chunk.text)
+                except ValueError:
+                    # Chunks without text parts (e.g. safety metadata only)
+                    continue
+                if weighted_length(self._normalize(''.join(chunks))) > max_length:
+                    logger.info("Tweet budget exceeded, cancelling Gemini stream")
+                    break
+        finally:
+            await self._close_stream(response)
+        return ''.join(chunks), response
+    
+    @staticmethod
+    async def _close_stream(response):
+        """Release the underlying stream if it was not consumed to the end"""
+        iterator = getattr(response, '_iterator', None)
+        for name in ('aclose', 'cancel'):
+            close = getattr(iterator, name, None)
+            if close is None:
+                continue
+            try:
+                result = close()
+                if asyncio.iscoroutine(result):
+                    await result
+            except Exception as e:
+                logger.debug(f"Error closing Gemini stream: {e}")
+            return
+    
+    @staticmethod
+    def _normalize(text: str) -> str:
+        """Strip whitespace and unwanted formatting from model output"""
+        content = text.strip()
+        
+        # Clean up any unwanted formatting
+        return content.replace('"', '').replace("'", "'")
+    
+    def _clean_content(self, text: str, max_length: int = MAX_TWEET_LENGTH) -> str:
+        """Normalize model output into postable tweet text"""
+        content = self._normalize(text)
+        
+        # Ensure it's within Twitter's weighted character limit
+        return truncate_tweet(content, max_length)
+    
+    def forget(self, content: str) -> int:
+        """Evict cached responses that produced content
+        
+        Called once X rejected content for good, so the next run with the
+        same prompt asks Gemini again instead of reposting the cached text.
+        """
+        if not self.cache:
+            return 0
+        
+        def _produced(text: str) -> bool:
+            normalized = self._normalize(text)
+            if content in (normalized, self._clean_content(text)):
+                return True
+            # Truncated to a longer (thread) budget
+            return content.endswith('...') and normalized.startswith(content[:-3].rstrip())
+        
+        evicted = self.cache.invalidate_matching(_produced)
+        if evicted:
+            logger.info(f"Evicted {evicted} cached response(s) for rejected content")
+        return evicted
+    
+    def _fallback_content(self, topic: str, time_context: str = "") -> str:
+        """Fallback content, preferring a fresh post from the fallback pool"""
+        if self.fallback_pool:
+            content = self.fallback_pool.take(time_context)
+            if content:
+                return content
+        
+        # Last resort: fixed text based on time
+        current_hour = datetime.now().hour
+        if current_hour < 12:
+            return f"Good morning! Daily insights about {topic}! 🌅 #AI #Technology #MorningMotivation"
+        else:
+            return f"Evening thoughts on {topic}! 🌙 #AI #Technology #EveningThoughts"
+    
+    async def generate_record(self, topic: str, time_context: str = "", additional_context: str = "",
+                              max_length: int = MAX_TWEET_LENGTH, use_cache: bool = True) -> 'PostRecord':
+        """Generate a post for the specified topic along with its model, token
+        counts and latency
+        
+        max_length above MAX_TWEET_LENGTH asks for longer text, e.g. to be
+        posted as a thread with split_into_thread(). Fallback content has
+        no model.
+        """
+        try:
+            prompt = self._build_prompt(topic, time_context, additional_context, max_length)
+            response = await self._request(prompt, use_cache=use_cache, max_length=max_length)
+            return PostRecord(
+                self._clean_content(response['text'], max_length),
+                topic=topic,
+                model=response['model'],
+                prompt_tokens=response['prompt_tokens'],
+                completion_tokens=response['completion_tokens'],
+                generation_latency=response['latency']
             )
             
-            content = response.text.strip()
-            
-            # Clean up any unwanted formatting
-            content = content.replace('"', '').replace("'", "'")
-            
-            # Ensure it's within Twitter's character limit
-            if len(content) > 280:
-                content = content[:277] + "..."
-            
-            return content
-            
         except Exception as e:
             logger.error(f"Error generating content: {e}")
-            # Fallback content based on time
-            current_hour = datetime.now().hour
-            if current_hour < 12:
-                return f"Good morning! Daily insights about {topic}! 🌅 #AI #Technology #MorningMotivation"
-            else:
-                return f"Evening thoughts on {topic}! 🌙 #AI #Technology #EveningThoughts"
+            return PostRecord(self._fallback_content(topic, time_context), topic=topic)
+    
+    async def generate_content(self, topic: str, time_context: str = "", additional_context: str = "",
+                               max_length: int = MAX_TWEET_LENGTH, use_cache: bool = True) -> str:
+        """Generate content for the specified topic"""
+        record = await self.generate_record(topic, time_context, additional_context, max_length, use_cache)
+        return record.content
+    
+    async def generate_candidates(self, topic: str, n: int, time_context: str = "", additional_context: str = "",
+                                  use_cache: bool = True) -> List[Dict[str, Any]]:
+        """Generate n candidate posts concurrently.
+        
+        Requests share one rendered prompt and run at most max_concurrency at a
+        time. Each returned candidate is a dict with the cleaned 'content', the
+        weighted 'raw_length' of the model output, the request 'latency' in
+        seconds and the 'model', 'prompt_tokens' and 'completion_tokens' as
+        returned by _request().
+        Failed requests are logged and left out of the result.
+        """
+        prompt = self._build_prompt(topic, time_context, additional_context)
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        
+        async def _candidate(index: int) -> Optional[Dict[str, Any]]:
+            async with semaphore:
+                try:
+                    response = await self._request(prompt, variant=index, use_cache=use_cache)
+                except Exception as e:
+                    logger.error(f"Error generating candidate {index + 1}/{n}: {e}")
+                    return None
+            return {
+                'content': self._clean_content(response['text']),
+                'raw_length': weighted_length(self._normalize(response['text'])),
+                'latency': response['latency'],
+                'model': response['model'],
+                'prompt_tokens': response['prompt_tokens'],
+                'completion_tokens': response['completion_tokens']
+            }
+        
+        results = await asyncio.gather(*(_candidate(i) for i in range(n)))
+        candidates = [candidate for candidate in results if candidate]
+        logger.info(f"Generated {len(candidates)}/{n} candidates")
+        return candidates
+
+class RateLimitExceeded(Exception):
+    """Raised when an X endpoint's budget will not refill within max_wait"""
+    
+    def __init__(self, endpoint: str, wait: float):
+        super().__init__(f"Rate limit for {endpoint} resets in {wait:.0f}s")
+        self.endpoint = endpoint
+        self.wait = wait
+
+class RateLimitScheduler:
+    """Async token buckets for X endpoints, driven by x-rate-limit-* headers
+    
+    Each bucket holds the remaining request budget reported by X and refills
+    to its limit at the reset time. acquire() reserves a token and, when the
+    bucket is empty, waits with asyncio.sleep so other coroutines keep
+    running; it raises RateLimitExceeded instead of waiting past max_wait.
+    Buckets are persisted when a path is given so the next run starts with
+    the budget the previous one observed.
+    """
+    
+    # Bucket name suffix -> (header prefix, window length in seconds) for the
+    # per-endpoint 15-minute window and the 24-hour per-user posting window
+    HEADER_PREFIXES = {'': ('x-rate-limit', 900), ' (24h)': ('x-user-limit-24hour', 86400)}
+    
+    def __init__(self, path: Optional[str] = None, max_wait: float = 60.0):
+        self.path = path
+        self.max_wait = max_wait
+        self.buckets: Dict[str, Dict[str, float]] = {}
+        self._load()
+    
+    def _load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self.buckets = json.load(f)
+        except Exception as e:
+            logger.warning(f"Could not load rate limit state: {e}")
+    
+    def _save(self):
+        if not self.path:
+            return
+        try:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.buckets, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.warning(f"Could not save rate limit state: {e}")
+    
+    def _refill(self, bucket: Dict[str, float], now: float):
+        """Start a new window once the reset time has passed"""
+        if now >= bucket['reset']:
+            bucket['remaining'] = bucket['limit']
+            bucket['reset'] = now + bucket['window']
+    
+    def wait_time(self, endpoint: str) -> float:
+        """Seconds until a request to endpoint may be sent (0 if budget is left)"""
+        now = time.time()
+        wait = 0.0
+        for suffix in self.HEADER_PREFIXES:
+            bucket = self.buckets.get(endpoint + suffix)
+            if bucket is None:
+                continue
+            self._refill(bucket, now)
+            if bucket['remaining'] <= 0:
+                wait = max(wait, bucket['reset'] - now)
+        return wait
+    
+    async def acquire(self, endpoint: str):
+        """Reserve one request on endpoint, waiting for a refill if needed"""
+        wait = self.wait_time(endpoint)
+        if wait > self.max_wait:
+            raise RateLimitExceeded(endpoint, wait)
+        if wait > 0:
+            logger.info(f"Rate limit reached for {endpoint}, waiting {wait:.1f}s")
+            await asyncio.sleep(wait)
+            # The wait may have been shared with other callers; re-check
+            return await self.acquire(endpoint)
+        for suffix in self.HEADER_PREFIXES:
+            bucket = self.buckets.get(endpoint + suffix)
+            if bucket is not None:
+                bucket['remaining'] -= 1
+    
+    def update(self, endpoint: str, headers, rate_limited: bool = False):
+        """Replace local estimates with the budget X reported in headers"""
+        if headers is None:
+            return
+        for suffix, (prefix, window) in self.HEADER_PREFIXES.items():
+            try:
+                remaining = int(headers[f'{prefix}-remaining'])
+                reset = float(headers[f'{prefix}-reset'])
+            except (KeyError, TypeError, ValueError):
+                continue
+            limit = int(headers.get(f'{prefix}-limit', remaining) or remaining)
+            self.buckets[endpoint + suffix] = {
+                'limit': limit, 'remaining': remaining, 'reset': reset, 'window': window
+            }
+        if rate_limited and endpoint not in self.buckets:
+            # 429 without headers: back off for a full 15-minute window
+            self.buckets[endpoint] = {'limit': 1, 'remaining': 0, 'reset': time.time() + 900, 'window': 900}
+        self._save()
+    
+    def budget(self) -> Dict[str, Dict[str, Any]]:
+        """Current budget per bucket: limit, remaining and seconds until reset"""
+        now = time.time()
+        budget = {}
+        for name, bucket in self.buckets.items():
+            self._refill(bucket, now)
+            budget[name] = {
+                'limit': bucket['limit'],
+                'remaining': bucket['remaining'],
+                'reset_in': max(0.0, bucket['reset'] - now)
+            }
+        return budget
+
+class RetryBudget:
+    """Number of retries allowed for the whole run, shared by all callers"""
+    
+    def __init__(self, max_retries: int = 5):
+        self.max_retries = max_retries
+        self.remaining = max_retries
+    
+    def reset(self):
+        """Refill the budget for a new run (each slot of a long-lived process)"""
+        self.remaining = self.max_retries
+    
+    def take(self) -> bool:
+        """Consume one retry, returning False when the budget is spent"""
+        if self.remaining <= 0:
+            return False
+        self.remaining -= 1
+        return True
+
+def classify_error(error: Exception) -> str:
+    """Classify a posting error as 'transient', 'rate_limited' or 'permanent'
+    
+    Server errors, timeouts and connection failures may succeed on retry,
+    429s succeed once the window resets, and any other 4xx (bad request,
+    auth, duplicate content) will fail again no matter how often it is sent.
+    """
+    if isinstance(error, RateLimitExceeded):
+        return 'rate_limited'
+    response = getattr(error, 'response', None)
+    status = getattr(response, 'status_code', None)
+    if status == 429:
+        return 'rate_limited'
+    if status is not None:
+        return 'transient' if status >= 500 or status == 408 else 'permanent'
+    # No HTTP response at all: connection resets, timeouts, DNS failures
+    if isinstance(error, (ConnectionError, TimeoutError, OSError, asyncio.TimeoutError)):
+        return 'transient'
+    return 'permanent'
+
+def is_duplicate_content(error: Exception) -> bool:
+    """Whether X rejected a post as a duplicate of an existing tweet"""
+    status = getattr(getattr(error, 'response', None), 'status_code', None)
+    return status == 403 and 'duplicate' in str(error).lower()
+
+def backoff_delay(attempt: int, base: float = 1.0, cap: float = 30.0) -> float:
+    """Exponential backoff with full jitter for the given retry attempt"""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+def create_http_session(pool_size: int = 10, keep_alive: bool = True):
+    """Build a long-lived requests session with a sized connection pool
+    
+    Connections to X are kept alive and reused across requests, so only the
+    first request per pooled connection pays for the TCP and TLS handshake.
+    pool_size bounds how many connections are kept per host, which should
+    cover the number of posts sent concurrently.
+    """
+    import requests
+    from requests.adapters import HTTPAdapter
+    
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max(1, pool_size), max_retries=0)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    session.headers['Connection'] = 'keep-alive' if keep_alive else 'close'
+    return session
+
+class AccountLogAdapter(logging.LoggerAdapter):
+    """Prefixes log messages with the account name when several are in use"""
+    
+    def process(self, msg, kwargs):
+        name = self.extra.get('account')
+        if name and name != 'default':
+            msg = f"[{name}] {msg}"
+        return msg, kwargs
+
+class PostResult:
+    """Outcome of TwitterPoster.post_tweet or post_thread
+    
+    tweets holds the data of every posted tweet, error_kind the
+    classify_error() kind of the failure that stopped posting, if any.
+    Returned per call rather than kept on the poster, so concurrent posts
+    never see each other's errors. Truthy once any tweet was posted.
+    """
+    
+    __slots__ = ('tweets', 'error_kind')
+    
+    def __init__(self, tweets: Optional[List[Dict[str, Any]]] = None, error_kind: Optional[str] = None):
+        self.tweets = tweets or []
+        self.error_kind = error_kind
+    
+    def __bool__(self) -> bool:
+        return bool(self.tweets)
+    
+    @property
+    def first(self) -> Optional[Dict[str, Any]]:
+        """The first posted tweet, e.g. the head of a thread"""
+        return self.tweets[0] if self.tweets else None
 
 class TwitterPoster:
     """Handles posting to X/Twitter"""
     
-    def __init__(self, api_keys: Dict[str, str]):
+    TWEET_ENDPOINT = 'POST /2/tweets'
+    # X accepts APPEND segments of up to 5 MB
+    MEDIA_CHUNK_SIZE = 4 * 1024 * 1024
+    
+    def __init__(self, api_keys: Dict[str, str], rate_limiter: Optional[RateLimitScheduler] = None,
+                 retry_budget: Optional[RetryBudget] = None, max_attempts: int = 4,
+                 pool_size: int = 10, keep_alive: bool = True, name: str = 'default',
+                 client=None):
+        self.name = name
+        self.log = AccountLogAdapter(logger, {'account': name})
         try:
-            self.client = tweepy.Client(
-                bearer_token=api_keys['bearer_token'],
-                consumer_key=api_keys['consumer_key'],
-                consumer_secret=api_keys['consumer_secret'],
-                access_token=api_keys['access_token'],
-                access_token_secret=api_keys['access_token_secret'],
-                wait_on_rate_limit=True
-            )
-            logger.info("Twitter client initialized successfully")
+            if client is not None:
+                # Prebuilt client exposing create_tweet (e.g. a local fake)
+                self.client = client
+                self.session = None
+            else:
+                with run_timer.phase('import'):
+                    import requests
+                    import tweepy
+                with run_timer.phase('client_init'):
+                    # Rate limits are handled by the async scheduler instead of
+                    # tweepy sleeping inside a worker thread; the raw response is
+                    # returned so its x-rate-limit-* headers can be read.
+                    self.client = tweepy.Client(
+                        bearer_token=api_keys['bearer_token'],
+                        consumer_key=api_keys['consumer_key'],
+                        consumer_secret=api_keys['consumer_secret'],
+                        access_token=api_keys['access_token'],
+                        access_token_secret=api_keys['access_token_secret'],
+                        return_type=requests.Response,
+                        wait_on_rate_limit=False
+                    )
+                    # Share one pooled keep-alive session for every request
+                    self.session = create_http_session(pool_size, keep_alive)
+                    self.client.session = self.session
+            # The v1.1 API for media uploads is only built when first needed
+            self._api_keys = api_keys
+            self._media_api = None
+            self.rate_limiter = rate_limiter or RateLimitScheduler()
+            self.retry_budget = retry_budget or RetryBudget()
+            self.max_attempts = max(1, max_attempts)
+            self.log.info("Twitter client initialized successfully")
         except Exception as e:
-            logger.error(f"Error initializing Twitter client: {e}")
+            self.log.error(f"Error initializing Twitter client: {e}")
             raise
     
-    async def post_tweet(self, content: str) -> Optional[Dict[str, Any]]:
-        """Post a tweet"""
+    def close(self):
+        """Close pooled connections"""
+        if self.session is not None:
+            self.session.close()
+    
+    def _get_media_api(self):
+        """v1.1 API client for media uploads, sharing the pooled session"""
+        if self._media_api is None:
+            import tweepy
+            auth = tweepy.OAuth1UserHandler(
+                self._api_keys['consumer_key'],
+                self._api_keys['consumer_secret'],
+                self._api_keys['access_token'],
+                self._api_keys['access_token_secret']
+            )
+            self._media_api = tweepy.API(auth)
+            self._media_api.session = self.session
+        return self._media_api
+    
+    @staticmethod
+    def _read_chunk(path: str, offset: int, size: int) -> bytes:
+        with open(path, 'rb') as f:
+            f.seek(offset)
+            return f.read(size)
+    
+    async def upload_media(self, path: str, media_category: Optional[str] = None,
+                           max_concurrency: int = 4) -> Optional[str]:
+        """Upload an image or video with the chunked media upload flow
+        
+        After INIT, the APPEND segments are read and sent concurrently (at
+        most max_concurrency in flight), then FINALIZE is called and, for
+        media that needs server-side processing, STATUS is polled until it
+        is done. Returns the media ID to attach to a post, or None on failure.
+        """
         try:
-            logger.info(f"Attempting to post tweet: {content}")
-            response = await asyncio.to_thread(
-                self.client.create_tweet, text=content
+            media_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+            if media_category is None:
+                if media_type.startswith('video/'):
+                    media_category = 'tweet_video'
+                elif media_type == 'image/gif':
+                    media_category = 'tweet_gif'
+                else:
+                    media_category = 'tweet_image'
+            total_bytes = os.path.getsize(path)
+            api = self._get_media_api()
+            
+            self.log.info(f"Uploading {path} ({total_bytes} bytes, {media_type})")
+            media = await asyncio.to_thread(
+                api.chunked_upload_init, total_bytes, media_type, media_category=media_category
             )
-            logger.info(f"Tweet posted successfully: {response.data['id']}")
-            return response.data
+            media_id = media.media_id_string
+            
+            semaphore = asyncio.Semaphore(max(1, max_concurrency))
+            
+            async def _append(segment_index: int):
+                async with semaphore:
+                    chunk = await asyncio.to_thread(
+                        self._read_chunk, path, segment_index * self.MEDIA_CHUNK_SIZE, self.MEDIA_CHUNK_SIZE
+                    )
+                    await asyncio.to_thread(
+                        api.chunked_upload_append, media_id, io.BytesIO(chunk), segment_index
+                    )
+            
+            segments = max(1, math.ceil(total_bytes / self.MEDIA_CHUNK_SIZE))
+            await asyncio.gather(*(_append(index) for index in range(segments)))
+            
+            media = await asyncio.to_thread(api.chunked_upload_finalize, media_id)
+            processing_info = getattr(media, 'processing_info', None)
+            while processing_info and processing_info.get('state') in ('pending', 'in_progress'):
+                await asyncio.sleep(processing_info.get('check_after_secs', 1))
+                media = await asyncio.to_thread(api.get_media_upload_status, media_id)
+                processing_info = getattr(media, 'processing_info', None)
+            if processing_info and processing_info.get('state') == 'failed':
+                self.log.error(f"Media processing failed: {processing_info.get('error')}")
+                return None
+            
+            self.log.info(f"Media uploaded successfully: {media_id} ({segments} chunks)")
+            return media_id
         except Exception as e:
-            logger.error(f"Error posting tweet: {e}")
+            self.log.error(f"Error uploading media: {e}")
             return None
+    
+    def rate_budget(self) -> Dict[str, Dict[str, Any]]:
+        """Remaining X API budget as last reported by the rate limit headers"""
+        return self.rate_limiter.budget()
+    
+    async def post_tweet(self, content: str, in_reply_to_tweet_id: Optional[str] = None,
+                         media_ids: Optional[List[str]] = None) -> PostResult:
+        """Post a tweet, retrying transient and rate-limited failures
+        
+        Retries use exponential backoff with jitter and draw on the run-wide
+        retry budget; rate-limited retries wait for the window to reset via
+        the rate limit scheduler instead. Permanent errors are not retried.
+        
+        A transient failure (e.g. a timeout) may come after X accepted the
+        tweet, so a duplicate-content 403 on a later attempt means it is
+        already live: that counts as success, with an unknown tweet ID.
+        """
+        attempt = 0
+        # Whether an earlier attempt may have been posted without us knowing
+        maybe_posted = False
+        while True:
+            try:
+                await self.rate_limiter.acquire(self.TWEET_ENDPOINT)
+                self.log.info(f"Attempting to post tweet: {content}")
+                response = await asyncio.to_thread(
+                    self.client.create_tweet,
+                    text=content,
+                    in_reply_to_tweet_id=in_reply_to_tweet_id,
+                    media_ids=media_ids
+                )
+                self.rate_limiter.update(self.TWEET_ENDPOINT, response.headers)
+                data = response.json()['data']
+                self.log.info(f"Tweet posted successfully: {data['id']}")
+                return PostResult([data])
+            except RateLimitExceeded as e:
+                self.log.error(f"Not posting tweet: {e}")
+                return PostResult(error_kind='rate_limited')
+            except Exception as e:
+                error_response = getattr(e, 'response', None)
+                if error_response is not None:
+                    self.rate_limiter.update(
+                        self.TWEET_ENDPOINT,
+                        getattr(error_response, 'headers', None),
+                        rate_limited=getattr(error_response, 'status_code', None) == 429
+                    )
+                kind = classify_error(e)
+                if maybe_posted and is_duplicate_content(e):
+                    self.log.warning("Tweet was already posted by an earlier attempt that failed transiently")
+                    return PostResult([{'id': None, 'text': content}])
+                maybe_posted = maybe_posted or kind == 'transient'
+                attempt += 1
+                if kind == 'permanent' or attempt >= self.max_attempts or not self.retry_budget.take():
+                    self.log.error(f"Error posting tweet ({kind}): {e}")
+                    return PostResult(error_kind=kind)
+                # Rate-limited retries wait in acquire() for the reset instead
+                delay = 0.0 if kind == 'rate_limited' else backoff_delay(attempt - 1)
+                self.log.warning(f"Error posting tweet ({kind}, attempt {attempt}/{self.max_attempts}): {e}; "
+                               f"retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+    
+    @staticmethod
+    def _prepare_thread_part(text: str, number: int, total: int) -> str:
+        """Validate one thread part and add its n/total counter"""
+        suffix = f" {number}/{total}" if total > 1 else ""
+        body = truncate_tweet(text.strip(), MAX_TWEET_LENGTH - weighted_length(suffix))
+        return body + suffix
+    
+    async def post_thread(self, parts: List[str], media_ids: Optional[List[str]] = None) -> PostResult:
+        """Post parts as a reply chain and return the posted tweets
+        
+        Each part must reply to the previous one, so posts are sequential.
+        Every part is validated and given its counter up front, which takes
+        microseconds next to a post. media_ids are attached to the first
+        part. Stops at the first part that fails to post; the result then
+        holds only the parts that made it and the error that stopped it.
+        """
+        posted = []
+        if not parts:
+            return PostResult()
+        total = len(parts)
+        prepared = [self._prepare_thread_part(part, number, total) for number, part in enumerate(parts, 1)]
+        reply_to = None
+        for index, text in enumerate(prepared):
+            result = await self.post_tweet(
+                text,
+                in_reply_to_tweet_id=reply_to,
+                media_ids=media_ids if index == 0 else None
+            )
+            if not result:
+                self.log.error(f"Thread stopped after {len(posted)}/{total} parts")
+                return PostResult(posted, result.error_kind)
+            posted.append(result.first)
+            reply_to = result.first['id']
+            if reply_to is None and index + 1 < total:
+                # Posted by an attempt whose response was lost; nothing to reply to
+                self.log.error(f"Thread stopped after {len(posted)}/{total} parts: tweet ID unknown")
+                return PostResult(posted, 'permanent')
+        self.log.info(f"Thread of {total} parts posted successfully")
+        return PostResult(posted)
+
+def create_content_generator(config: Dict[str, Any],
+                             model_factory: Optional[Callable[[str], Any]] = None) -> ContentGenerator:
+    """Build a ContentGenerator with the cache and fallback pool from config"""
+    cache = None
+    if config.get('cache_ttl', 0) > 0:
+        cache = ResponseCache(
+            config.get('cache_dir', '.gemini_cache'),
+            config.get('cache_max_entries', 256),
+            config['cache_ttl']
+        )
+    fallback_pool = None
+    if config.get('fallback_pool_path'):
+        fallback_pool = FallbackPool(config['fallback_pool_path'])
+    return ContentGenerator(
+        config['gemini_api_key'],
+        max_concurrency=config.get('generation_concurrency', 4),
+        cache=cache,
+        stream=config.get('stream_generation', True),
+        fallback_pool=fallback_pool,
+        hedge_model=config.get('hedge_model') or None,
+        hedge_percentile=config.get('hedge_percentile', 0.95),
+        hedge_delay=config.get('hedge_delay', 5.0),
+        latency_tracker=LatencyTracker(config.get('latency_path')),
+        model_factory=model_factory
+    )
 
 class GitHubActionsPostingAgent:
     """Posting agent optimized for GitHub Actions"""
     
-    def __init__(self, config: Dict[str, Any]):
+    def __init__(self, config: Dict[str, Any], content_generator: Optional[ContentGenerator] = None,
+                 twitter_posters: Optional[Dict[str, TwitterPoster]] = None):
         self.config = config
-        self.content_generator = ContentGenerator(config['gemini_api_key'])
-        self.twitter_poster = TwitterPoster(config['twitter_api_keys'])
-        self.post_history = []
-        self._load_post_history()
+        self.content_generator = content_generator or create_content_generator(config)
+        # One poster per account, each with its own credentials, connection
+        # pool, rate limit buckets and retry budget
+        self.accounts = config.get('accounts') or [
+            {'name': name, 'twitter_api_keys': config.get('twitter_api_keys')}
+            for name in (twitter_posters or ['default'])
+        ]
+        self.twitter_posters: Dict[str, TwitterPoster] = twitter_posters or {
+            account['name']: self._create_poster(account) for account in self.accounts
+        }
+        self.history = create_history_store(config)
+        # Near-duplicate check against every past post; 0 disables it
+        self.near_duplicate_threshold = config.get('near_duplicate_threshold', 0.5)
+        self.near_duplicate_retries = config.get('near_duplicate_retries', 2)
+        self._near_duplicates: Optional[MinHashIndex] = None
+        # Vocabulary-level (TF-IDF cosine) check; needs NumPy, 0 disables it
+        self.semantic_threshold = config.get('semantic_threshold', 0.8)
+        self._semantic_index: Optional[TfidfIndex] = None
+        self._indexes_loaded = False
+        self.outbox = None
+        if config.get('outbox_path'):
+            self.outbox = Outbox(config['outbox_path'], config.get('outbox_max_attempts', 3))
+        self.twitter_poster = self.twitter_posters[self.accounts[0]['name']]
+    
+    @staticmethod
+    def _account_state_path(path: Optional[str], name: str) -> Optional[str]:
+        """Per-account variant of a state file path (unchanged for 'default')"""
+        if not path or name == 'default':
+            return path
+        root, ext = os.path.splitext(path)
+        return f"{root}.{name}{ext}"
     
-    async def create_and_post(self):
-        """Generate content and post to X"""
+    def _create_poster(self, account: Dict[str, Any]) -> TwitterPoster:
+        rate_limit_path = self._account_state_path(self.config.get('rate_limit_path'), account['name'])
+        return TwitterPoster(
+            account['twitter_api_keys'],
+            RateLimitScheduler(rate_limit_path, self.config.get('rate_limit_max_wait', 60.0)),
+            RetryBudget(self.config.get('post_retry_budget', 5)),
+            pool_size=self.config.get('http_pool_size', 10),
+            keep_alive=self.config.get('http_keep_alive', True),
+            name=account['name']
+        )
+    
+    async def create_and_post(self, posting_time: Optional[str] = None):
+        """Generate content and post to X for every configured account
+        
+        Accounts are served concurrently; returns True only if every account
+        posted successfully. posting_time defaults to the configured one.
+        """
+        posting_time = posting_time or self.config.get('posting_time', '09:00')
+        results = await asyncio.gather(*(
+            self._create_and_post_for(account, posting_time) for account in self.accounts
+        ))
+        if len(results) > 1:
+            logger.info(f"Posted for {sum(results)}/{len(results)} accounts")
+        return all(results)
+    
+    async def _create_and_post_for(self, account: Dict[str, Any], posting_time: str) -> bool:
+        """Generate content and post it with one account"""
+        name = account['name']
+        twitter_poster = self.twitter_posters[name]
+        upload_task = None
+        entry = None
         try:
-            topic = self.config['topic']
-            posting_time = self.config.get('posting_time', '09:00')
+            topic = account.get('topic') or self.config['topic']
             
             # Determine if this is morning or evening post
-            time_context = "morning" if posting_time.startswith('10') or posting_time.startswith('0') else "evening"
+            time_context = time_context_for(posting_time)
             
-            logger.info(f"Starting {time_context} content generation for topic: {topic}")
+            # Don't pay for generation when X will not accept the post anyway
+            wait = twitter_poster.rate_limiter.wait_time(TwitterPoster.TWEET_ENDPOINT)
+            if wait > twitter_poster.rate_limiter.max_wait:
+                twitter_poster.log.error(f"Posting budget exhausted for another {wait:.0f}s, skipping this run")
+                return False
             
-            # Add context based on recent posts to avoid repetition
-            recent_context = ""
-            if len(self.post_history) > 0:
-                recent_posts = self.post_history[-5:]  # Last 5 posts
-                recent_context = f"Avoid repeating these recent topics/phrases: {', '.join([post[:50] for post in recent_posts])}"
+            # Start the media upload first so it runs while content is generated
+            media_path = account.get('media_path') or self.config.get('media_path')
+            if media_path:
+                upload_task = asyncio.create_task(twitter_poster.upload_media(media_path))
             
-            # Generate content
-            content = await self.content_generator.generate_content(
-                topic, 
-                time_context,
-                recent_context
-            )
+            # Content left over from a failed post goes out before anything new
+            thread_max_parts = max(1, self.config.get('thread_max_parts', 1))
+            entry = self.outbox.claim_next(name, time_context) if self.outbox else None
+            if entry and self._is_near_duplicate(entry['content']):
+                twitter_poster.log.warning(f"Dropping outbox entry {entry['id']}: too similar to a posted tweet")
+                self.outbox.remove(entry['id'])
+                entry = None
+            if entry:
+                record = PostRecord(entry['content'], topic=entry['topic'] or topic, **entry['generation'])
+                time_context = entry['time_context'] or time_context
+                twitter_poster.log.info(f"Posting outbox entry {entry['id']} "
+                                        f"(attempt {entry['attempts'] + 1}, {self.outbox.pending(name)} queued)")
+            else:
+                twitter_poster.log.info(f"Starting {time_context} content generation for topic: {topic}")
+                record = await self._generate(topic, time_context, thread_max_parts, name)
+                if self.outbox:
+                    # Persist before posting so a failure keeps the content
+                    entry = {'id': self.outbox.add(name, record.content, topic, time_context, claim=True,
+                                                   generation=record.generation())}
+            content = record.content
+            
+            media_ids = None
+            if upload_task:
+                # Only the part of the upload that outlasted generation is waited for
+                with run_timer.phase('media_upload_wait'):
+                    media_id = await upload_task
+                if media_id:
+                    media_ids = [media_id]
+                else:
+                    twitter_poster.log.warning("Media upload failed, posting text only")
             
             # Post to X
-            result = await self.twitter_poster.post_tweet(content)
+            with run_timer.phase('network'):
+                post_start = time.perf_counter()
+                if weighted_length(content) > MAX_TWEET_LENGTH:
+                    # A partially posted thread is public, so it still counts
+                    result = await twitter_poster.post_thread(
+                        split_into_thread(content, thread_max_parts),
+                        media_ids
+                    )
+                else:
+                    result = await twitter_poster.post_tweet(content, media_ids=media_ids)
+                record.post_latency = time.perf_counter() - post_start
+            twitter_poster.log.info(f"X rate budget: {twitter_poster.rate_budget()}")
+            
+            dropped = False
+            if entry:
+                if result:
+                    self.outbox.remove(entry['id'])
+                else:
+                    dropped = not self.outbox.record_failure(entry['id'], result.error_kind)
+            if not result and (dropped or result.error_kind == 'permanent'):
+                # Don't let the response cache hand the same content back
+                self.content_generator.forget(content)
             
             if result:
                 # Save to history
-                self.post_history.append(content)
-                # Keep only last 20 posts in memory
-                if len(self.post_history) > 20:
-                    self.post_history = self.post_history[-20:]
-                
-                # Save to file for persistence
-                self._save_post_history()
+                record.timestamp = datetime.now().isoformat()
+                record.account = name
+                record.tweet_id = result.first.get('id')
+                self._save_post_history(record)
                 
-                logger.info(f"Successfully posted {time_context} tweet: {content}")
+                twitter_poster.log.info(f"Successfully posted {time_context} tweet: {content}")
                 return True
             else:
-                logger.error("Failed to post tweet")
+                twitter_poster.log.error("Failed to post tweet")
                 return False
                 
         except Exception as e:
-            logger.error(f"Error in create_and_post: {e}")
+            twitter_poster.log.error(f"Error in create_and_post: {e}")
             return False
+        finally:
+            if upload_task and not upload_task.done():
+                upload_task.cancel()
+            if entry:
+                self.outbox.release(entry['id'])
+    
+    async def prepare(self, posting_time: Optional[str] = None) -> int:
+        """Queue content in the outbox for the next run at posting_time
+        
+        Accounts that already have a due entry for the slot's time context
+        are skipped; returns the number of entries added.
+        """
+        if not self.outbox:
+            return 0
+        time_context = time_context_for(posting_time or self.config.get('posting_time', '09:00'))
+        thread_max_parts = max(1, self.config.get('thread_max_parts', 1))
+        
+        async def _prepare(account: Dict[str, Any]) -> int:
+            if self.outbox.due_count(account['name'], time_context):
+                return 0
+            topic = account.get('topic') or self.config['topic']
+            record = await self._generate(topic, time_context, thread_max_parts, account['name'])
+            self.outbox.add(account['name'], record.content, topic, time_context, generation=record.generation())
+            return 1
+        
+        added = sum(await asyncio.gather(*(_prepare(account) for account in self.accounts)))
+        if added:
+            logger.info(f"Prepared {time_context} posts for {added} account(s)")
+        return added
+    
+    def _catch_up_indexes(self):
+        """Bring the duplicate indexes up to date with the post history
+        
+        Both indexes are kept on disk (unless their paths are unset) and only
+        read the posts written since they were last updated. When both need
+        the same part of the history, it is read once.
+        """
+        start = time.perf_counter()
+        reads: Dict[str, Any] = {}
+        
+        def since(marker):
+            key = json.dumps(marker)
+            if key not in reads:
+                reads[key] = self.history.since(marker)
+            return reads[key]
+        
+        if self.near_duplicate_threshold > 0:
+            if self._near_duplicates is None:
+                self._near_duplicates = MinHashIndex(
+                    path=self.config.get('near_duplicate_index_path') or ':memory:'
+                )
+            added = self._near_duplicates.catch_up(since)
+            if added:
+                logger.info(f"Indexed {added} past posts for near-duplicate checks")
+        if self.semantic_threshold > 0:
+            try:
+                self._catch_up_tfidf_index(since)
+            except ImportError:
+                logger.warning("NumPy is not installed, skipping the semantic duplicate check")
+                self.semantic_threshold = 0
+        self._indexes_loaded = True
+        if reads:
+            logger.debug(f"Duplicate indexes caught up in {time.perf_counter() - start:.2f}s")
     
-    def _save_post_history(self):
-        """Save post history to file"""
+    def _catch_up_tfidf_index(self, since: Callable[[Optional[List[Any]]], Any]):
+        directory = self.config.get('semantic_index_dir')
+        if self._semantic_index is None and directory:
+            self._semantic_index = TfidfIndex.load(directory)
+        index = self._semantic_index
+        if index is None or not index.catch_up(since):
+            contents, marker = since(None)
+            index = self._semantic_index = TfidfIndex(contents, marker=marker)
+            logger.info(f"Built TF-IDF index of {len(index)} past posts")
+            if directory:
+                index.save(directory)
+        elif directory and len(index.extra) >= index.MERGE_EVERY:
+            index.save(directory)
+    
+    def _find_duplicates(self, contents: List[str]) -> List[bool]:
+        """Flag contents too similar to a past post
+        
+        Wording is compared with the MinHash index, then the remaining
+        contents are scored against the TF-IDF index as one batch.
+        """
+        flags = [False] * len(contents)
+        if not self._indexes_loaded:
+            self._catch_up_indexes()
+        if self.near_duplicate_threshold > 0:
+            index = self._near_duplicates
+            for i, content in enumerate(contents):
+                similarity = index.similarity(content)
+                if similarity >= self.near_duplicate_threshold:
+                    logger.info(f"Near-duplicate of a past post (similarity {similarity:.2f}): {content[:50]!r}")
+                    flags[i] = True
+        remaining = [i for i, flagged in enumerate(flags) if not flagged]
+        semantic = self._semantic_index if remaining and self.semantic_threshold > 0 else None
+        if semantic is not None and len(semantic):
+            for i, similarity in zip(remaining, semantic.similarities([contents[i] for i in remaining])):
+                if similarity >= self.semantic_threshold:
+                    logger.info(f"Semantically similar to a past post (cosine {similarity:.2f}): "
+                                f"{contents[i][:50]!r}")
+                    flags[i] = True
+        return flags
+    
+    def _is_near_duplicate(self, content: str) -> bool:
+        """Whether content is too similar to any post in the history"""
+        return bool(content) and self._find_duplicates([content])[0]
+    
+    async def _generate(self, topic: str, time_context: str, thread_max_parts: int = 1,
+                        account: Optional[str] = None) -> PostRecord:
+        """Generate a post for topic and account, regenerating near-duplicates of past posts"""
+        for attempt in range(self.near_duplicate_retries + 1):
+            # Retries must not be answered from the response cache
+            record = await self._generate_once(topic, time_context, thread_max_parts,
+                                               use_cache=attempt == 0, account=account)
+            if record.model is None:
+                # Fallback content: with Gemini down, a retry would only use up another pool post
+                break
+            if not self._is_near_duplicate(record.content):
+                break
+            if attempt < self.near_duplicate_retries:
+                logger.warning(f"Regenerating near-duplicate post ({attempt + 1}/{self.near_duplicate_retries})")
+        return record
+    
+    async def _generate_once(self, topic: str, time_context: str, thread_max_parts: int = 1,
+                             use_cache: bool = True, account: Optional[str] = None) -> PostRecord:
+        """Generate a fresh post for topic, avoiding the account's recently posted phrasing"""
+        # Add context based on recent posts to avoid repetition. With a
+        # single account the history is not filtered, as records written
+        # before accounts existed carry none.
+        recent_context = ""
+        if len(self.accounts) == 1:
+            account = None
+        recent_posts = [record.content for record in self.history.recent(5, account)]  # Last 5 posts
+        if recent_posts:
+            recent_context = f"Avoid repeating these recent topics/phrases: {', '.join([post[:50] for post in recent_posts])}"
+        
+        # With threads enabled the model may use the room of several tweets
+        # instead of having the rest cut off
+        with run_timer.phase('generation'):
+            candidate_count = self.config.get('candidate_count', 1)
+            if candidate_count > 1 and thread_max_parts == 1:
+                candidates = await self.content_generator.generate_candidates(
+                    topic,
+                    candidate_count,
+                    time_context,
+                    recent_context,
+                    use_cache=use_cache
+                )
+                record = self._select_candidate(candidates, topic)
+            else:
+                record = None
+            
+            if not record:
+                record = await self.content_generator.generate_record(
+                    topic, 
+                    time_context,
+                    recent_context,
+                    max_length=MAX_TWEET_LENGTH * thread_max_parts,
+                    use_cache=use_cache
+                )
+        return record
+    
+    def _select_candidate(self, candidates: List[Dict[str, Any]],
+                          topic: Optional[str] = None) -> Optional[PostRecord]:
+        """Pick the best candidate, preferring ones that fit without truncation
+        
+        Exact repeats of past posts are caught by the near-duplicate check;
+        with that disabled, candidates are only compared to the recent posts.
+        """
+        duplicates = self._find_duplicates([c['content'] for c in candidates])
+        recent = set() if self.near_duplicate_threshold > 0 else {r.content for r in self.history.recent(20)}
+        fresh = [
+            c for c, duplicate in zip(candidates, duplicates)
+            if not duplicate and c['content'] not in recent
+        ]
+        if not fresh:
+            return None
+        # Untruncated posts first, then the one that uses the most of the budget
+        best = max(fresh, key=lambda c: (c['raw_length'] <= MAX_TWEET_LENGTH, len(c['content'])))
+        logger.info(f"Selected candidate generated in {best['latency']:.2f}s out of {len(candidates)}")
+        return PostRecord.from_candidate(best, topic)
+    
+    def _save_post_history(self, record: PostRecord):
+        """Add a posted tweet to the history store"""
         try:
-            history_data = {
-                'posts': self.post_history,
-                'last_updated': datetime.now().isoformat(),
-                'total_posts': len(self.post_history)
-            }
-            with open('post_history.json', 'w') as f:
-                json.dump(history_data, f, indent=2)
-            logger.info(f"Post history saved with {len(self.post_history)} posts")
+            self.history.append(record)
+            if self._indexes_loaded:
+                # Also picks up posts other processes wrote since the last check
+                self._catch_up_indexes()
+            logger.info(f"Post history saved ({record.content[:50]!r})")
         except Exception as e:
             logger.error(f"Error saving post history: {e}")
+
+class CronSchedule:
+    """Standard five-field cron expression (minute hour day month weekday)
     
-    def _load_post_history(self):
-        """Load post history from file"""
-        try:
-            if os.path.exists('post_history.json'):
-                with open('post_history.json', 'r') as f:
-                    data = json.load(f)
-                    self.post_history = data.get('posts', [])
-                logger.info(f"Loaded {len(self.post_history)} posts from history")
+    Fields accept *, lists, ranges and steps (e.g. '*/15', '1-5', '0,30').
+    When both day of month and weekday are restricted, either may match, as
+    in cron. Times are naive local datetimes.
+    """
+    
+    FIELDS = (('minute', 0, 59), ('hour', 0, 23), ('day', 1, 31), ('month', 1, 12), ('weekday', 0, 7))
+    
+    def __init__(self, expression: str):
+        self.expression = expression
+        fields = expression.split()
+        if len(fields) != 5:
+            raise ValueError(f"Cron expression needs 5 fields: {expression!r}")
+        values = [self._parse_field(field, low, high) for field, (_, low, high) in zip(fields, self.FIELDS)]
+        self.minutes, self.hours, self.days, self.months, weekdays = (sorted(value) for value in values)
+        # 0 and 7 are both Sunday
+        self.weekdays = {day % 7 for day in weekdays}
+        # Like cron, a field starting with '*' (including '*/n') does not
+        # restrict the day for the OR rule
+        self.day_restricted = not fields[2].startswith('*')
+        self.weekday_restricted = not fields[4].startswith('*')
+    
+    @staticmethod
+    def _parse_field(field: str, low: int, high: int) -> set:
+        values = set()
+        for part in field.split(','):
+            spec, _, step = part.partition('/')
+            step = int(step) if step else None
+            if step is not None and step < 1:
+                raise ValueError(f"Cron field {field!r} has a step below 1")
+            if spec == '*':
+                start, end = low, high
+            elif '-' in spec:
+                start, end = (int(bound) for bound in spec.split('-', 1))
             else:
-                logger.info("No existing post history found")
-        except Exception as e:
-            logger.error(f"Error loading post history: {e}")
-            self.post_history = []
+                start = int(spec)
+                # 'a/n' steps from a to the end of the range
+                end = high if step else start
+            if not low <= start <= end <= high:
+                raise ValueError(f"Cron field {field!r} is out of range {low}-{high}")
+            values.update(range(start, end + 1, step or 1))
+        return values
+    
+    def _day_matches(self, day: datetime) -> bool:
+        day_match = day.day in self.days
+        weekday_match = (day.weekday() + 1) % 7 in self.weekdays
+        if self.day_restricted and self.weekday_restricted:
+            return day_match or weekday_match
+        return day_match and weekday_match
+    
+    def next_after(self, after: datetime) -> datetime:
+        """First time strictly after after that the expression fires"""
+        start = after.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        day = start.replace(hour=0, minute=0)
+        # Four years covers every day of month/weekday combination
+        for _ in range(4 * 366):
+            if day.month in self.months and self._day_matches(day):
+                for hour in self.hours:
+                    for minute in self.minutes:
+                        candidate = day.replace(hour=hour, minute=minute)
+                        if candidate >= start:
+                            return candidate
+            day += timedelta(days=1)
+        raise ValueError(f"Cron expression never fires: {self.expression!r}")
+
+class PostingDaemon:
+    """Runs posting slots on cron schedules from one long-lived process
+    
+    Timers are kept in a heap ordered by their next fire time. While waiting
+    for a slot its content is generated into the outbox, so the clients stay
+    warm and the slot itself only has to post. Slots that fire more than
+    MISSED_SLOT_GRACE seconds late (the host was suspended, or an earlier
+    slot overran) are skipped and logged instead of posted back-to-back.
+    """
+    
+    MISSED_SLOT_GRACE = 600
+    
+    def __init__(self, agent: 'GitHubActionsPostingAgent', expressions: List[str]):
+        self.agent = agent
+        self.schedules = [CronSchedule(expression) for expression in expressions]
+        self.stopping = asyncio.Event()
+    
+    def stop(self):
+        """Finish the current slot, then exit run()"""
+        logger.info("Stopping posting daemon")
+        self.stopping.set()
+    
+    async def _sleep_until(self, when: datetime) -> bool:
+        """Sleep until when; returns False if the daemon was stopped first"""
+        while not self.stopping.is_set():
+            remaining = (when - datetime.now()).total_seconds()
+            if remaining <= 0:
+                return True
+            # Wake up regularly so clock changes and suspends are noticed
+            try:
+                await asyncio.wait_for(self.stopping.wait(), min(remaining, 60))
+            except asyncio.TimeoutError:
+                pass
+        return False
+    
+    async def run(self):
+        now = datetime.now()
+        timers = [(schedule.next_after(now), index) for index, schedule in enumerate(self.schedules)]
+        heapq.heapify(timers)
+        while timers and not self.stopping.is_set():
+            fire_at, index = timers[0]
+            posting_time = fire_at.strftime('%H:%M')
+            logger.info(f"Next posting slot at {fire_at:%Y-%m-%d %H:%M} ({self.schedules[index].expression})")
+            
+            # Generate the slot's content while idle instead of when it fires
+            prepare = asyncio.create_task(self.agent.prepare(posting_time))
+            if not await self._sleep_until(fire_at):
+                prepare.cancel()
+                break
+            try:
+                await prepare
+            except Exception as e:
+                logger.error(f"Error preparing posting slot: {e}")
+            
+            now = datetime.now()
+            heapq.heapreplace(timers, (self.schedules[index].next_after(max(fire_at, now)), index))
+            lateness = (now - fire_at).total_seconds()
+            if lateness > self.MISSED_SLOT_GRACE:
+                logger.warning(f"Missed posting slot {fire_at:%Y-%m-%d %H:%M} ({lateness:.0f}s late), skipping it")
+                continue
+            # Each slot is a run of its own, with a fresh retry budget
+            for poster in self.agent.twitter_posters.values():
+                poster.retry_budget.reset()
+            success = await self.agent.create_and_post(posting_time)
+            logger.info(f"Posting slot {fire_at:%Y-%m-%d %H:%M} {'succeeded' if success else 'failed'} "
+                        f"(started {lateness:.1f}s late)")
+
+def load_accounts(default_keys: Dict[str, Optional[str]]) -> List[Dict[str, Any]]:
+    """Accounts to post with, from TWITTER_ACCOUNTS or the single TWITTER_* set
+    
+    TWITTER_ACCOUNTS holds a JSON list (or the path of a JSON file) of objects
+    with a name, the five X credential fields and optional topic/media_path.
+    """
+    raw = os.getenv("TWITTER_ACCOUNTS", "").strip()
+    if not raw:
+        return [{'name': 'default', 'twitter_api_keys': default_keys}]
+    if not raw.startswith('['):
+        with open(raw, 'r') as f:
+            raw = f.read()
+    accounts = []
+    for index, entry in enumerate(json.loads(raw), 1):
+        accounts.append({
+            'name': str(entry.get('name') or f"account{index}"),
+            'topic': entry.get('topic'),
+            'media_path': entry.get('media_path'),
+            'twitter_api_keys': {key: entry.get(key) for key in default_keys}
+        })
+    return accounts
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description="Generate AI content with Gemini and post it to X")
+    parser.add_argument(
+        '--mode',
+        choices=['post', 'fill-fallback-pool', 'generate-ahead', 'daemon'],
+        default='post',
+        help="post: generate and post one tweet (default); "
+             "fill-fallback-pool: pre-generate posts used when Gemini fails; "
+             "generate-ahead: queue posts for every slot of the coming days in the outbox; "
+             "daemon: keep running and post on the DAEMON_CRON schedule"
+    )
+    parser.add_argument(
+        '--count',
+        type=int,
+        default=10,
+        help="posts per time slot to keep in the fallback pool (default: 10)"
+    )
+    parser.add_argument(
+        '--days',
+        type=int,
+        default=7,
+        help="days of posting slots to queue in generate-ahead mode (default: 7)"
+    )
+    return parser.parse_args(argv)
 
 async def main():
     """Main function optimized for GitHub Actions"""
     
+    args = parse_args()
+    
     # Load environment variables
+    with run_timer.phase('import'):
+        from dotenv import load_dotenv
     load_dotenv()
     
     # Load configuration from environment variables
+    state_dir = os.getenv("AGENT_STATE_DIR", ".agent_state")
     config = {
         "topic": os.getenv("POSTING_TOPIC", "Artificial Intelligence"),
         "posting_time": os.getenv("POSTING_TIME", "09:00"),
+        "posting_slots": [slot.strip() for slot in os.getenv("POSTING_SLOTS", "10:15,21:05").split(',')
+                          if slot.strip()],
+        "daemon_cron": [expression.strip() for expression in os.getenv("DAEMON_CRON", "").split(';')
+                        if expression.strip()],
+        "candidate_count": int(os.getenv("CANDIDATE_COUNT", "1")),
+        "generation_concurrency": int(os.getenv("GENERATION_CONCURRENCY", "4")),
+        "stream_generation": os.getenv("STREAM_GENERATION", "true").lower() != "false",
+        "cache_dir": os.getenv("GEMINI_CACHE_DIR", ".gemini_cache"),
+        "cache_ttl": float(os.getenv("GEMINI_CACHE_TTL", "43200")),
+        "cache_max_entries": int(os.getenv("GEMINI_CACHE_MAX_ENTRIES", "256")),
+        "fallback_pool_path": os.path.join(state_dir, "fallback_pool.json"),
+        "hedge_model": os.getenv("GEMINI_HEDGE_MODEL", ""),
+        "hedge_percentile": float(os.getenv("GEMINI_HEDGE_PERCENTILE", "95")) / 100,
+        "hedge_delay": float(os.getenv("GEMINI_HEDGE_DELAY", "5")),
+        "latency_path": os.path.join(state_dir, "gemini_latency.json"),
+        "rate_limit_path": os.path.join(state_dir, "rate_limits.json"),
+        "outbox_path": os.path.join(state_dir, "outbox.db"),
+        "history_path": os.getenv("POST_HISTORY_PATH", "post_history.jsonl"),
+        "legacy_history_path": "post_history.json",
+        "history_retention": int(os.getenv("POST_HISTORY_RETENTION", "0")),
+        "history_backend": os.getenv("POST_HISTORY_BACKEND", "jsonl"),
+        "history_db_path": os.path.join(state_dir, "post_history.db"),
+        "near_duplicate_index_path": os.path.join(state_dir, "near_duplicates.db"),
+        "semantic_index_dir": os.path.join(state_dir, "tfidf_index"),
+        "near_duplicate_threshold": float(os.getenv("NEAR_DUPLICATE_THRESHOLD", "0.5")),
+        "near_duplicate_retries": int(os.getenv("NEAR_DUPLICATE_RETRIES", "2")),
+        "semantic_threshold": float(os.getenv("SEMANTIC_DUPLICATE_THRESHOLD", "0.8")),
+        "outbox_max_attempts": int(os.getenv("OUTBOX_MAX_ATTEMPTS", "3")),
+        "rate_limit_max_wait": float(os.getenv("RATE_LIMIT_MAX_WAIT", "60")),
+        "post_retry_budget": int(os.getenv("POST_RETRY_BUDGET", "5")),
+        "thread_max_parts": int(os.getenv("THREAD_MAX_PARTS", "1")),
+        "http_pool_size": int(os.getenv("X_HTTP_POOL_SIZE", "10")),
+        "http_keep_alive": os.getenv("X_HTTP_KEEP_ALIVE", "true").lower() != "false",
+        "media_path": os.getenv("POSTING_MEDIA_PATH", ""),
         "gemini_api_key": os.getenv("GEMINI_API_KEY"),
         "twitter_api_keys": {
             "bearer_token": os.getenv("TWITTER_BEARER_TOKEN"),
@@ -217,22 +2927,80 @@ async def main():
     if not config["gemini_api_key"]:
         missing_vars.append("GEMINI_API_KEY")
     
-    twitter_keys = config["twitter_api_keys"]
-    for key, value in twitter_keys.items():
-        if not value:
-            missing_vars.append(f"TWITTER_{key.upper()}")
+    try:
+        config["accounts"] = load_accounts(config["twitter_api_keys"])
+    except Exception as e:
+        logger.error(f"Invalid TWITTER_ACCOUNTS: {e}")
+        run_timer.report()
+        sys.exit(1)
+    
+    if args.mode in ('post', 'daemon'):
+        for account in config["accounts"]:
+            for key, value in account["twitter_api_keys"].items():
+                if not value:
+                    if account["name"] == 'default':
+                        missing_vars.append(f"TWITTER_{key.upper()}")
+                    else:
+                        missing_vars.append(f"{account['name']}.{key}")
     
     if missing_vars:
         logger.error(f"Missing environment variables: {', '.join(missing_vars)}")
+        run_timer.report()
         sys.exit(1)
     
-    logger.info(f"Starting posting agent for topic: {config['topic']} at {config['posting_time']}")
+    if args.mode == 'fill-fallback-pool':
+        logger.info(f"Filling fallback pool for topic: {config['topic']}")
+        generator = create_content_generator(config)
+        with run_timer.phase('generation'):
+            await generator.fallback_pool.fill(generator, config['topic'], args.count)
+        run_timer.report()
+        sys.exit(0)
+    
+    if args.mode == 'generate-ahead':
+        slots = posting_slots(config['posting_slots'], args.days)
+        logger.info(f"Queueing {len(slots)} slots for {len(config['accounts'])} account(s) "
+                    f"over the next {args.days} days")
+        generator = create_content_generator(config)
+        outbox = Outbox(config['outbox_path'], config['outbox_max_attempts'])
+        with run_timer.phase('generation'):
+            await outbox.fill(generator, config['accounts'], slots, config['topic'])
+        outbox.close()
+        run_timer.report()
+        sys.exit(0)
+    
+    if args.mode == 'daemon':
+        # One cron entry per posting slot unless a schedule is given
+        expressions = config['daemon_cron'] or [
+            f"{int(slot.split(':')[1])} {int(slot.split(':')[0])} * * *" for slot in config['posting_slots']
+        ]
+        logger.info(f"Starting posting daemon for topic: {config['topic']} on {'; '.join(expressions)}")
+        agent = GitHubActionsPostingAgent(config)
+        daemon = PostingDaemon(agent, expressions)
+        loop = asyncio.get_running_loop()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(signum, daemon.stop)
+            except NotImplementedError:
+                # Windows event loops do not support signal handlers
+                pass
+        await daemon.run()
+        for poster in agent.twitter_posters.values():
+            poster.close()
+        agent.history.close()
+        if agent._near_duplicates is not None:
+            agent._near_duplicates.close()
+        run_timer.report()
+        sys.exit(0)
+    
+    logger.info(f"Starting posting agent for topic: {config['topic']} at {config['posting_time']} "
+                f"({len(config['accounts'])} account(s))")
     
     # Create and run the agent
     agent = GitHubActionsPostingAgent(config)
     
     # Post immediately (this is how GitHub Actions will work)
     success = await agent.create_and_post()
+    run_timer.report()
     
     if success:
         logger.info("✅ Posting completed successfully!")